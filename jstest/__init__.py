@@ -15,6 +15,7 @@
 from jstest.builder.builder import Builder
 from jstest.common import console, paths, symbol_resolver, utils
 from jstest.emulate import pseudo_terminal, twisted_server
+from jstest.executor import JobExecutor
 from jstest.flasher import flasher
 from jstest.testresult import TestResult
 from jstest.testrunner.testrunner import TestRunner
@@ -89,13 +90,35 @@ def create_testing_environment(user_options, job_options):
     if options.testsuite:
         modules[options.app].paths.tests = options.testsuite
 
+    # Use a separate source tree for every job, so the modules don't
+    # have to be patched and restored in place.
+    if options.worktrees:
+        for name in deps:
+            # The worktrees get the folder name of their original trees, so the
+            # relative paths between the trees (e.g. CONFIG_APPS_DIR="../apps"
+            # of NuttX) are kept. The user defined application is named after
+            # the application.
+            folder = utils.basename(modules[name].src)
+            if name == options.app and options.app_path:
+                folder = name
+
+            modules[name].origin = modules[name].src
+            modules[name].src = utils.join(paths.WORKTREE_PATH, options.get('commit') or '',
+                                           options.id, folder)
+
     # Add an 'app' named module that is just a reference
     # to the user defined target application.
     modules.app = modules[options.app]
     modules.app.name = options.app
 
     # Set the current build directory to the paths.
-    resources.paths.builddir = utils.join(resources.paths.build, options.id)
+    resources.paths.builddir = utils.join(resources.paths.build, options.get('commit') or '',
+                                          options.id)
+
+    # By default, the modules are built from scratch on one core.
+    # The Builder modifies these options in incremental build mode.
+    options.clean_build = True
+    options.parallel_jobs = 1
 
     # Modify the no-build options according to the no-profile-build option.
     no_profile_build = options.no_profile_build and 'profile' in options.id
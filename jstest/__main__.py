@@ -20,8 +20,9 @@ import sys
 import traceback
 
 import jstest
-from jstest import Builder, TestResult, TestRunner
-from jstest import flasher, paths, pseudo_terminal, twisted_server, utils
+from jstest import JobExecutor
+from jstest import paths, pseudo_terminal, twisted_server, utils
+from jstest.testrunner.devices import lease
 
 
 EXIT_SUCCESS = 0
@@ -75,6 +76,32 @@ def parse_options():
                         action='store_true', default=False,
                         help='upload the test results (default: %(default)s)')
 
+    parser.add_argument('--jobs',
+                        metavar='N', default=1, type=int,
+                        help='specify the number of jobs to run in parallel (default: %(default)s)')
+
+    parser.add_argument('--pipeline',
+                        action='store_true', default=False,
+                        help='flash and test the built jobs while the next ones are built '
+                             '(default: %(default)s)')
+
+    parser.add_argument('--commits',
+                        metavar='COMMIT', nargs='+',
+                        help='test the given commits of the application one after the other')
+
+    parser.add_argument('--incremental',
+                        action='store_true', default=False,
+                        help='build incrementally on multiple cores (default: %(default)s)')
+
+    parser.add_argument('--build-cache',
+                        action='store_true', default=False,
+                        help='reuse the artifacts of identical builds (default: %(default)s)')
+
+    parser.add_argument('--worktrees',
+                        action='store_true', default=False,
+                        help='use separate git worktrees for the modules of every job '
+                             '(default: %(default)s)')
+
     parser.add_argument('--timeout',
                         metavar='SEC', default=180, type=int,
                         help='specify the timeout (default: %(default)s sec)')
@@ -83,6 +110,17 @@ def parse_options():
                         action='store_true', default=False,
                         help='do not measure memory statistics (default: %(default)s)')
 
+    parser.add_argument('--freya',
+                        action='store_true', default=False,
+                        help='measure the system heap of IoT.js on Linux devices with '
+                             'Valgrind (Freya) instead of the malloc interposer library, '
+                             'every test runs twice (default: %(default)s)')
+
+    parser.add_argument('--crash-signature',
+                        metavar='TEXT', action='append', default=[],
+                        help='output text that means the device is crashed, in addition '
+                             'to the built-in signatures (can be used multiple times)')
+
     parser.add_argument('--coverage',
                         action='store_true', default=False,
                         help='calculate the JS source code coverage (default: %(default)s)')
@@ -95,10 +133,43 @@ def parse_options():
                        default=False, action='store_true',
                        help='emulate the connection')
 
+    parser.add_argument('--batch',
+                        action='store_true', default=False,
+                        help='run the tests in batches: Linux devices use one tester.py '
+                             'invocation, NuttX and TizenRT devices receive the next test '
+                             'without waiting for the prompt (default: %(default)s)')
+
     parser.add_argument('--testsuite',
                         metavar='TEST_SUITE_PATH',
                         help='specify the path to user-owned tests')
 
+    group = parser.add_argument_group("Board farm")
+
+    group.add_argument('--farm',
+                       metavar='FILE',
+                       help='select the boards from the given board farm description '
+                            'instead of the --ip and --device-id options')
+
+    group.add_argument('--boards',
+                       metavar='N', default=1, type=int,
+                       help='specify the number of boards to lease from the farm '
+                            '(default: %(default)s)')
+
+    group.add_argument('--priority',
+                       metavar='N', default=0, type=int,
+                       help='specify the priority of the jobs while waiting for the boards, '
+                            'higher is served first (default: %(default)s)')
+
+    group.add_argument('--lease-dir',
+                       metavar='PATH', default=paths.LEASE_PATH,
+                       help='specify the folder of the board leases that is shared by the '
+                            'jstest processes (default: %(default)s)')
+
+    group.add_argument('--farm-status',
+                       action='store_true', default=False,
+                       help='print the leases, the waiting jobs and the utilization of '
+                            'the boards, then exit')
+
     group = parser.add_argument_group("Secure Shell communication")
 
     group.add_argument('--username',
@@ -109,13 +180,28 @@ def parse_options():
                        help='specify the password to login to the device')
 
     group.add_argument('--ip',
-                       metavar='IPADDR',
-                       help='specify the IP address of the device')
+                       metavar='IPADDR', nargs='+',
+                       help='specify the IP address of the device (or the devices)')
 
     group.add_argument('--port',
                        metavar='PORT', default=22, type=int,
                        help='specify the SSH port (default: %(default)s)')
 
+    group.add_argument('--ssh-exec',
+                       action='store_true', default=False,
+                       help='run every command on a separate exec channel instead of an '
+                            'interactive shell (default: %(default)s)')
+
+    group.add_argument('--agent',
+                       action='store_true', default=False,
+                       help='send the tests to a long-lived tester.py on the device '
+                            '(default: %(default)s)')
+
+    group.add_argument('--device-jobs',
+                       metavar='N', default=1, type=int,
+                       help='specify the number of tests to run concurrently on the device '
+                            '(default: %(default)s)')
+
     group.add_argument('--remote-workdir',
                        metavar='PATH',
                        help='specify the test folder on the device')
@@ -123,8 +209,18 @@ def parse_options():
     group = parser.add_argument_group("Serial communication")
 
     group.add_argument('--device-id',
-                       metavar='DEVICE-ID',
-                       help='specify the device ID (e.g. /dev/ttyACM0)')
+                       metavar='DEVICE-ID', nargs='+',
+                       help='specify the device ID (e.g. /dev/ttyACM0) (or the devices)')
+
+    group.add_argument('--stlink-serial',
+                       metavar='SERIAL', nargs='+',
+                       help='specify the serial number of the ST-LINK programmer of the '
+                            'STM32F4-Discovery board (or of every --device-id, in order)')
+
+    group.add_argument('--reset-interval',
+                       metavar='N', default=0, type=int,
+                       help='reset the device after every N tests, 0 means that the device is '
+                            'reset only after crashes and timeouts (default: %(default)s)')
 
     group.add_argument('--baud',
                        type=int, default=115200,
@@ -146,25 +242,90 @@ def parse_options():
     return parser.parse_args()
 
 
-def adjust_options(options):
+def adjust_build_options(options):
     '''
-    Adjust some of the command line arguments.
+    Adjust the options of the source trees and the build.
     '''
-    if options.device == 'rpi3' and options.app == 'jerryscript':
-        jstest.console.warning('JerryScript is not supported for Tizen.')
+    if options.commits and not options.worktrees:
+        jstest.console.warning('Testing multiple commits requires separate source trees,'
+                               ' so the --worktrees option was enabled.')
+        options.worktrees = True
+
+    if (options.jobs > 1 or options.pipeline) and not options.worktrees:
+        jstest.console.warning('The jobs are flashed while the next jobs are built, which requires'
+                               ' separate source trees, so the --worktrees option was enabled.')
+        options.worktrees = True
+
+    if options.incremental and not options.worktrees:
+        jstest.console.warning('Incremental build requires separate build folders for the'
+                               ' jobs, so the --worktrees option was enabled.')
+        options.worktrees = True
+
+    if options.app_path:
+        options.app_path = utils.abspath(options.app_path)
+
+        # The worktrees are checked out from the commits of the application,
+        # so the uncommitted changes of the tree would not be tested.
+        if options.worktrees and not options.commits:
+            status, _ = utils.execute(options.app_path, 'git', ['status', '--porcelain'],
+                                      quiet=True)
+
+            if status.strip():
+                jstest.console.error('The worktrees would not contain the uncommitted changes'
+                                     ' of %s. Commit them or don\'t use the --worktrees,'
+                                     ' --incremental, --jobs, --pipeline options.'
+                                     % options.app_path)
+                sys.exit(1)
+
+
+def adjust_scheduling_options(options):
+    '''
+    Adjust the options of the test execution on the device.
+    '''
+    if options.device_jobs > 1 and not options.batch:
+        jstest.console.warning('Concurrent tests are executed in batch mode,'
+                               ' so the --batch option was enabled.')
+        options.batch = True
+
+    if options.batch and options.device in ['rpi2', 'rpi3'] and not options.ssh_exec:
+        jstest.console.warning('Batch mode requires SSH exec channels,'
+                               ' so the --ssh-exec option was enabled.')
+        options.ssh_exec = True
+
+    if options.agent and not options.ssh_exec:
+        jstest.console.warning('The test agent requires SSH exec channels,'
+                               ' so the --ssh-exec option was enabled.')
+        options.ssh_exec = True
+
+
+def adjust_coverage_options(options):
+    '''
+    Check the requirements of the coverage measurement.
+    '''
+    if not options.coverage:
+        return
+
+    if not options.debugger or options.debugger == 'no_address':
+        jstest.console.error('Coverage measurement is require the enabled debugger option'
+                             ' with a valid server ADDRESS')
         sys.exit(1)
 
-    # TODO: resolve this section, debugger should work on every target.
-    if options.debugger:
-        if options.device == 'stm32f4dis':
-            jstest.console.warning('Debugger is disabled, beacuse it is not supported on'
-                                   ' STM32F4-Discovery')
-            options.debugger = None
-        elif options.device == 'artik053' and options.app == 'jerryscript':
-            jstest.console.warning('Debugger is disabled, because it is not supported on'
-                                   ' ARTIK053 with JerryScript')
-            options.debugger = None
+    if options.app != 'iotjs':
+        jstest.console.warning('Coverage measurement is only supported with IoT.js!')
+        sys.exit(1)
 
+    if options.buildtype != 'debug':
+        jstest.console.warning('Buidltype was set to debug because the coverage measurement is'
+                               ' only supported with debug build type!')
+        # Overwrite the buildtype option to debug.
+        # In IoT.js the code is minimized in release mode, which will mess up the line numbers.
+        options.buildtype = 'debug'
+
+
+def adjust_device_options(options):
+    '''
+    Select the boards (emulated, command line or board farm) of the tests.
+    '''
     if options.emulate:
         options.no_flash = True
 
@@ -182,22 +343,64 @@ def adjust_options(options):
             options.device_id = pseudo_terminal.open_pseudo_terminal(options.device)
             atexit.register(pseudo_terminal.close_pseudo_terminal, options)
 
-    if options.coverage:
-        if not options.debugger or options.debugger == 'no_address':
-            jstest.console.error('Coverage measurement is require the enabled debugger option'
-                                 ' with a valid server ADDRESS')
-            sys.exit(1)
+    # Multiple boards of the same type can be used to run the tests in parallel.
+    # The first board is used for the board specific steps (e.g. build info).
+    options.ips = options.ip if isinstance(options.ip, list) else [options.ip]
+    options.device_ids = options.device_id
+    if not isinstance(options.device_id, list):
+        options.device_ids = [options.device_id]
+
+    # The boards are selected by --ip (telnet) or by --device-id (serial).
+    board_count = len(options.ips) if options.ip else len(options.device_ids)
+
+    options.stlink_serials = options.stlink_serial or []
+    if len(options.stlink_serials) not in [0, board_count]:
+        jstest.console.error('Every board (--ip or --device-id) requires its --stlink-serial.')
+        sys.exit(1)
+    options.stlink_serials += [None] * (board_count - len(options.stlink_serials))
+
+    if options.coverage and max(len(options.ips), len(options.device_ids), options.boards) > 1:
+        jstest.console.warning('Coverage measurement is supported only on one device!')
+        options.ips = options.ips[:1]
+        options.device_ids = options.device_ids[:1]
+        options.stlink_serials = options.stlink_serials[:1]
+        options.boards = 1
+
+    if options.farm:
+        options.farm = utils.abspath(options.farm)
 
-        if options.app != 'iotjs':
-            jstest.console.warning('Coverage measurement is only supported with IoT.js!')
-            sys.exit(1)
+        if options.emulate:
+            jstest.console.warning('The emulated device is used instead of the board farm.')
+            options.farm = None
 
-        if options.buildtype != 'debug':
-            jstest.console.warning('Buidltype was set to debug because the coverage measurement is'
-                                   ' only supported with debug build type!')
-            # Overwrite the buildtype option to debug.
-            # In IoT.js the code is minimized in release mode, which will mess up the line numbers.
-            options.buildtype = 'debug'
+    options.ip = options.ips[0]
+    options.device_id = options.device_ids[0]
+    options.stlink_serial = options.stlink_serials[0]
+
+
+def adjust_options(options):
+    '''
+    Adjust some of the command line arguments.
+    '''
+    if options.device == 'rpi3' and options.app == 'jerryscript':
+        jstest.console.warning('JerryScript is not supported for Tizen.')
+        sys.exit(1)
+
+    # TODO: resolve this section, debugger should work on every target.
+    if options.debugger:
+        if options.device == 'stm32f4dis':
+            jstest.console.warning('Debugger is disabled, beacuse it is not supported on'
+                                   ' STM32F4-Discovery')
+            options.debugger = None
+        elif options.device == 'artik053' and options.app == 'jerryscript':
+            jstest.console.warning('Debugger is disabled, because it is not supported on'
+                                   ' ARTIK053 with JerryScript')
+            options.debugger = None
+
+    adjust_build_options(options)
+    adjust_scheduling_options(options)
+    adjust_coverage_options(options)
+    adjust_device_options(options)
 
     if options.quiet:
         utils.define_environment('QUIET', 1)
@@ -208,9 +411,6 @@ def adjust_options(options):
     if options.testsuite:
         options.testsuite = utils.abspath(options.testsuite)
 
-    if options.app_path:
-        options.app_path = utils.abspath(options.app_path)
-
     return options
 
 
@@ -219,26 +419,19 @@ def main():
     Main function of the remote testrunner.
     '''
     user_options = adjust_options(parse_options())
-    testresult = TestResult(user_options)
+
+    if user_options.farm_status:
+        lease.report_status(user_options)
+        sys.exit(EXIT_SUCCESS)
+
+    executor = JobExecutor(user_options)
     exitcode = EXIT_SUCCESS
 
     try:
         # Execute all the jobs defined in the runnable.jobs file.
-        for job_options in utils.read_json_file(paths.RUNNABLE_JOBS):
-            env = jstest.create_testing_environment(user_options, job_options)
-
-            builder = Builder(env)
-            builder.build()
-
-            flasher.flash(env)
-
-            testrunner = TestRunner(env)
-            testrunner.run()
-            testrunner.save()
-
-            testresult.append(env.options.id, env.paths.builddir)
+        executor.run(utils.read_json_file(paths.RUNNABLE_JOBS))
         # Upload all the results to the Firebase database.
-        testresult.upload()
+        executor.upload()
 
     except (Exception, KeyboardInterrupt) as e:
         # Don't print backtrace for keyboard interrupt.
@@ -248,7 +441,7 @@ def main():
         exitcode = EXIT_FAILURE
 
     # Revert all the patches and restore all the modified files.
-    jstest.resources.finalize(env)
+    executor.finalize()
 
     sys.exit(exitcode)
 
@@ -12,8 +12,11 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import multiprocessing
+
 from jstest import resources
 from jstest.common import utils, paths
+from jstest.builder import cache
 from jstest.builder import utils as builder_utils
 
 
@@ -77,6 +80,25 @@ class Builder(object):
         if self.env.options.no_build:
             return
 
+        cache_key = None
+
+        if self.env.options.build_cache:
+            cache_key = cache.create_key(self.env)
+            # Skip the build if the same sources were already built.
+            if cache.restore(self.env, cache_key):
+                # The build-once modules (e.g. ST-Link) are not cached.
+                modules = self.read_modules(build_once=True)
+
+                init_modules(modules)
+                build_modules(modules)
+                save_artifacts(modules)
+                return
+
+        config_hash = None
+
+        if self.env.options.incremental:
+            config_hash = self.prepare_incremental_build()
+
         modules = self.read_modules()
 
         init_modules(modules)
@@ -86,6 +108,34 @@ class Builder(object):
         # Create build information.
         builder_utils.create_build_info(self.env)
 
+        if config_hash:
+            utils.write_file(self.env.paths.builddir + '.config-hash', config_hash)
+
+        if cache_key:
+            cache.store(self.env, cache_key)
+
+    def prepare_incremental_build(self):
+        '''
+        Select the build mode (clean or incremental) and the number of parallel build jobs.
+        '''
+        options = self.env.options
+        # Note: the hash is calculated before the build options are modified.
+        config_hash = builder_utils.create_config_hash(self.env)
+        hash_file = self.env.paths.builddir + '.config-hash'
+
+        # The previous build folders can be reused if the configuration is the same.
+        options.clean_build = not (utils.exists(hash_file) and
+                                   utils.read_file(hash_file) == config_hash)
+
+        if options.clean_build:
+            # Force a clean build next time if the current one fails.
+            utils.remove_file(hash_file)
+
+        # Share the processor cores between the jobs that are built at the same time.
+        options.parallel_jobs = max(1, multiprocessing.cpu_count() // max(1, options.jobs))
+
+        return config_hash
+
     def should_build(self, build_info):
         '''
         Test weather a component should be built or not.
@@ -117,9 +167,10 @@ class Builder(object):
 
         return False
 
-    def read_modules(self):
+    def read_modules(self, build_once=False):
         '''
-        Collect buildable modules and their build instructions.
+        Collect buildable modules and their build instructions. If build_once
+        is True, only the modules with the 'build-once' marker are collected.
         '''
         modules = {}
 
@@ -130,6 +181,10 @@ class Builder(object):
                 continue
 
             build_info = utils.read_config_file(filename, self.env)
+
+            if build_once and 'build-once' not in build_info:
+                continue
+
             # Check if the project is alredy built.
             if self.should_build(build_info):
                 modules[name] = build_info[self.device]
@@ -0,0 +1,159 @@
+# Copyright 2018-present Samsung Electronics Co., Ltd. and other contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import os
+import threading
+
+from jstest import resources
+from jstest.builder import utils as builder_utils
+from jstest.common import console, paths, utils
+
+
+# Files of the build folder that are not created by the build.
+_IGNORED_FILES = ['testresults.json*']
+
+
+def changes_hash(src):
+    '''
+    Create a checksum from the uncommitted changes of the source tree.
+    '''
+    checksum = hashlib.sha1()
+
+    # Note: the changes of the submodules are the part of the diff.
+    diff, _ = utils.execute(src, 'git', ['diff', 'HEAD', '--binary', '--submodule=diff'],
+                            quiet=True)
+    checksum.update(diff)
+
+    untracked, _ = utils.execute(src, 'git', ['ls-files', '--others', '--exclude-standard', '-z'],
+                                 quiet=True)
+
+    for filename in sorted(untracked.split('\0')):
+        path = utils.join(src, filename)
+
+        if filename and os.path.isfile(path):
+            checksum.update('%s\0%s\0' % (filename, utils.file_hash(path)))
+
+    return checksum.hexdigest()
+
+
+def build_once_entries(env):
+    '''
+    Return the names of the build folder entries that belong to the
+    build-once modules (e.g. Freya). These are not cached.
+    '''
+    entries = set()
+
+    for build_info in builder_utils.read_build_infos(env, build_once=True).values():
+        for artifact in build_info.get('artifacts', []):
+            dst = artifact.get('dst', '')
+
+            if dst.startswith(env.paths.builddir + os.sep):
+                entries.add(dst[len(env.paths.builddir) + 1:].split(os.sep)[0])
+
+    return list(entries)
+
+
+def create_key(env):
+    '''
+    Create a checksum from everything that has effect on the build result.
+    '''
+    modules = {}
+
+    for name, module in env.modules.iteritems():
+        # The application is also listed under its own name.
+        if name == 'app':
+            continue
+
+        patches = []
+        for patch in resources.read_patches(env, module):
+            patches.append([patch.get('submodule', ''), utils.file_hash(patch['file'])])
+
+        configs = []
+        for config in module.get('config', []):
+            if eval(config.get('condition', 'True')):
+                configs.append([config['dst'], utils.path_hash(config['src'])])
+
+        modules[name] = {
+            'commit': utils.last_commit_info(module['src'])['commit'],
+            # Uncommitted changes (e.g. the tree of --app-path).
+            'changes': changes_hash(module['src']),
+            'patches': patches,
+            'configs': configs
+        }
+
+    return utils.data_hash({
+        'modules': modules,
+        'build': builder_utils.read_build_infos(env),
+        'tests': utils.path_hash(env.modules.app.paths.tests)
+    })
+
+
+def restore(env, key):
+    '''
+    Copy the cached build artifacts into the build folder. The other
+    content of the build folder (e.g. the test results and the artifacts
+    of the build-once modules) is kept.
+    '''
+    cache_dir = utils.join(paths.BUILD_CACHE_PATH, key)
+
+    if not utils.exists(cache_dir):
+        return False
+
+    utils.mkdir(env.paths.builddir)
+
+    for entry in os.listdir(cache_dir):
+        utils.copy(utils.join(cache_dir, entry), utils.join(env.paths.builddir, entry))
+
+    # Tools that work in the module folders (e.g. 'make download' of
+    # TizenRT) should also find the cached images.
+    for build_info in builder_utils.read_build_infos(env, build_once=False).values():
+        for artifact in build_info.get('artifacts', []):
+            src = artifact.get('src')
+            dst = artifact.get('dst')
+
+            if not (dst and os.path.isfile(dst)):
+                continue
+
+            if not eval(artifact.get('condition', 'True')):
+                continue
+
+            utils.copy(dst, src)
+
+    console.info('Build artifacts are restored from the cache (%s)' % key)
+
+    return True
+
+
+def store(env, key):
+    '''
+    Save the content of the build folder into the cache.
+    '''
+    cache_dir = utils.join(paths.BUILD_CACHE_PATH, key)
+
+    if utils.exists(cache_dir):
+        return
+
+    # Parallel jobs could save the same key, so the copy is created
+    # under a temporary name that is renamed when it is complete.
+    temp_dir = '%s.%d.%d' % (cache_dir, os.getpid(), threading.current_thread().ident)
+
+    ignored = _IGNORED_FILES + build_once_entries(env)
+
+    utils.copy(env.paths.builddir, temp_dir, ignore_patterns=ignored)
+
+    try:
+        os.rename(temp_dir, cache_dir)
+    except OSError:
+        utils.rmtree(temp_dir)
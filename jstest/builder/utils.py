@@ -15,7 +15,7 @@
 import os
 
 from jstest.builder import lumpy
-from jstest.common import utils
+from jstest.common import paths, utils
 
 
 _LIBLIST = [
@@ -32,6 +32,59 @@ _LIBLIST = [
 ]
 
 
+def read_build_infos(env, build_once=None):
+    '''
+    Read the resolved build instructions of all the modules. If build_once
+    is given, only the modules with (True) or without (False) the
+    'build-once' marker are read.
+    '''
+    build_infos = {}
+
+    for name in env.modules:
+        filename = utils.join(paths.BUILDER_MODULES_PATH, '%s.build.config' % name)
+        # Skip modules that don't have configuration file (e.g. nuttx-apps).
+        if not utils.exists(filename):
+            continue
+
+        build_info = utils.read_config_file(filename, env)
+
+        if build_once is not None and ('build-once' in build_info) != build_once:
+            continue
+
+        build_infos[name] = build_info.get(env.options.device, {})
+
+    return build_infos
+
+
+def create_config_hash(env):
+    '''
+    Create a checksum from the resolved build configuration.
+    '''
+    configs = []
+
+    for name, module in env.modules.iteritems():
+        # The application is also listed under its own name.
+        if name == 'app':
+            continue
+
+        for config in module.get('config', []):
+            if not eval(config.get('condition', 'True')):
+                continue
+
+            # Changes in the linked folders (e.g. testsuite) are
+            # handled by the incremental build.
+            checksum = ''
+            if os.path.isfile(config['src']):
+                checksum = utils.file_hash(config['src'])
+
+            configs.append([config['dst'], checksum])
+
+    return utils.data_hash({
+        'build': read_build_infos(env),
+        'configs': sorted(configs)
+    })
+
+
 def create_build_info(env):
     '''
     Write binary size and commit information into a file.
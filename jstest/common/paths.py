@@ -33,6 +33,13 @@ BUILD_PATH = os.path.join(PROJECT_ROOT, 'build')
 
 RESULT_PATH = os.path.join(PROJECT_ROOT, 'results')
 
+BUILD_CACHE_PATH = os.path.join(BUILD_PATH, 'cache')
+
+WORKTREE_PATH = os.path.join(PROJECT_ROOT, 'deps', 'worktrees')
+
+# The board leases are shared by all the jstest checkouts of the user.
+LEASE_PATH = os.path.join(HOME, '.jstest', 'leases')
+
 #
 # ================================
 #
@@ -68,3 +75,5 @@ SIMPLE_TESTER = os.path.join(RESOURCES_PATH, 'etc', 'simpletester.py')
 TESTRUNNER_PATH = os.path.join(JSTEST_PATH, 'testrunner')
 
 SKIPLIST_PATH = os.path.join(TESTRUNNER_PATH, 'skiplist')
+
+CRASH_SIGNATURES = os.path.join(TESTRUNNER_PATH, 'crash-signatures.json')
@@ -12,6 +12,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import time
+
 from jstest.common import console
 
 def report_testset(testset):
@@ -48,16 +50,16 @@ def report_configuration(env):
     console.log('  timeout:            %s sec' % env.options.timeout)
 
     if env.options.device in ['rpi2', 'rpi3']:
-        console.log('  ip:                 %s' % env.options.ip)
+        console.log('  ip:                 %s' % ', '.join(map(str, env.options.ips)))
         console.log('  port:               %s' % env.options.port)
         console.log('  username:           %s' % env.options.username)
         console.log('  remote workdir:     %s' % env.options.remote_workdir)
     elif env.options.device in ['stm32f4dis', 'artik053']:
-        console.log('  device-id:          %s' % env.options.device_id)
+        console.log('  device-id:          %s' % ', '.join(map(str, env.options.device_ids)))
         console.log('  baud:               %d' % env.options.baud)
 
 
-def report_final(testresults):
+def report_final(testresults, elapsed_time=None):
     results = {}
 
     results['pass'] = 0
@@ -65,8 +67,13 @@ def report_final(testresults):
     results['skip'] = 0
     results['timeout'] = 0
 
+    overhead = 0
+    duration = 0
+
     for test in testresults:
         results[test['result']] += 1
+        overhead += test.get('overhead', 0)
+        duration += test.get('duration', 0)
 
     console.log()
     console.log('Finished with all tests:', console.TERMINAL_BLUE)
@@ -75,6 +82,17 @@ def report_final(testresults):
     console.log('  TIMEOUT: %d' % results['timeout'], console.TERMINAL_RED)
     console.log('  SKIP:    %d' % results['skip'], console.TERMINAL_YELLOW)
 
+    if overhead:
+        console.log()
+        console.log('Device reset and login overhead: %.1f sec' % overhead)
+
+    if elapsed_time:
+        # The sum of the test durations is the time of a sequential run.
+        console.log()
+        console.log('Elapsed time: %.1f sec (%.2f tests/sec)'
+                    % (elapsed_time, len(testresults) / elapsed_time))
+        console.log('Speedup over sequential execution: %.2fx' % (duration / elapsed_time))
+
 
 def report_coverage(coverage_info):
     console.log()
@@ -92,3 +110,33 @@ def report_coverage(coverage_info):
                         console.TERMINAL_GREEN)
         else:
             console.log("\t %s.js was not reached by the tests" % src_name, console.TERMINAL_YELLOW)
+
+
+def report_farm(boards, queue, window):
+    console.log()
+    console.log('Boards (utilization of the last %d hours):' % (window / 3600),
+                console.TERMINAL_BLUE)
+
+    for board in boards:
+        holder = board['holder']
+
+        if holder:
+            state = 'leased by %s (pid %s on %s) for %.0f sec' % (holder.get('owner'),
+                                                                 holder.get('pid'),
+                                                                 holder.get('host'),
+                                                                 time.time() - holder['since'])
+            color = console.TERMINAL_YELLOW
+        else:
+            state = 'free'
+            color = console.TERMINAL_GREEN
+
+        console.log('  %-20s %5.1f%%   %s' % (board['name'], board['utilization'] * 100, state),
+                    color)
+
+    console.log()
+    console.log('Waiting jobs: %d' % len(queue), console.TERMINAL_BLUE)
+
+    for ticket in queue:
+        console.log('  priority %d: %d board(s) of %s (pid %d on %s, waiting for %.0f sec)'
+                    % (ticket['priority'], ticket['count'], ', '.join(ticket['boards']),
+                       ticket['pid'], ticket['host'], time.time() - ticket['created']))
@@ -97,6 +97,7 @@ def resolve_symbol(symbol, env):
         'device': env.options.device,
         'appname': env.options.app,
         'ip-addr': env.options.ip,
+        'stlink-serial': env.options.stlink_serial or '',
         'port': env.options.port,
         'user': env.options.username,
         'gateway': env.options.router,
@@ -118,8 +119,12 @@ def resolve_symbol(symbol, env):
         'home': paths.HOME,
         'flash': not env.options.no_flash,
         'memstat': not env.options.no_memstat,
+        'freya': env.options.freya,
         'coverage': bool(env.options.coverage),
         'debugger':bool(env.options.debugger),
+        'incremental': env.options.incremental,
+        'clean-build': env.options.clean_build,
+        'parallel-jobs': env.options.parallel_jobs,
         'test-build': 'test-build' in env.options.id,
         'minimal-profile-build': 'minimal-profile-build' in env.options.id,
         'es5.1-profile-build': 'target-es5.1-profile-build' in env.options.id,
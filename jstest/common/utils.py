@@ -12,16 +12,22 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import hashlib
 import json
 import os
 import re
 import shutil
 import subprocess
+import threading
 import time
 
 from jstest.common import console, paths, symbol_resolver
 
 
+# Per-thread state of the job that the current thread is working on.
+_JOB_CONTEXT = threading.local()
+
+
 class TimeoutException(Exception):
     '''
     Custom exception in case of timeout.
@@ -29,6 +35,34 @@ class TimeoutException(Exception):
     pass
 
 
+def set_job_log(log_file):
+    '''
+    Redirect the output of the executed commands on the current thread.
+    '''
+    _JOB_CONTEXT.log_file = log_file
+
+
+def get_job_log():
+    '''
+    Get the log file of the job that runs on the current thread.
+    '''
+    return getattr(_JOB_CONTEXT, 'log_file', None)
+
+
+def set_job_environment(environ):
+    '''
+    Use a separate set of environment variables on the current thread.
+    '''
+    _JOB_CONTEXT.environ = environ
+
+
+def get_job_environment():
+    '''
+    Get the environment variables of the job that runs on the current thread.
+    '''
+    return getattr(_JOB_CONTEXT, 'environ', None)
+
+
 def exec_builtin(cwd, cmd, args, env):
     '''
     Execute the built-in command.
@@ -55,6 +89,11 @@ def exec_shell(cwd, cmd, args, env, quiet, strict):
         stdout = subprocess.PIPE
         stderr = subprocess.STDOUT
 
+    # Jobs that run in parallel write their outputs into separate log files.
+    if not quiet and get_job_log():
+        stdout = get_job_log()
+        stderr = subprocess.STDOUT
+
     if not quiet and os.environ.get('QUIET', ''):
         print_command(cwd, cmd, args)
 
@@ -85,7 +124,10 @@ def execute(cwd, cmd, args=None, env=None, quiet=False, strict=True):
         env = {}
 
     # Append the user defined variables to the system's one.
-    env = merge_dicts(env, os.environ.copy())
+    system_env = os.environ.copy()
+    system_env.update(get_job_environment() or {})
+
+    env = merge_dicts(env, system_env)
 
     match = re.search(r'function\(([a-zA-Z_]+)\)', cmd)
     # Check if native function is defined as a command.
@@ -231,6 +273,24 @@ def read_json_file(filename):
         return json.load(json_file)
 
 
+def write_file(filename, data):
+    '''
+    Write the given data into a text file.
+    '''
+    mkdir(dirname(filename))
+
+    with open(filename, 'w') as filename_p:
+        filename_p.write(data)
+
+
+def read_file(filename):
+    '''
+    Read the content of a text file.
+    '''
+    with open(filename, 'r') as filename_p:
+        return filename_p.read()
+
+
 def read_config_file(filename, env):
     '''
     Read JSON based configuration file.
@@ -240,7 +300,7 @@ def read_config_file(filename, env):
     return symbol_resolver.resolve(config, env)
 
 
-def copy(src, dst):
+def copy(src, dst, ignore_patterns=None):
     '''
     Copy src to dst.
     '''
@@ -250,7 +310,11 @@ def copy(src, dst):
         if exists(dst):
             shutil.rmtree(dst)
 
-        shutil.copytree(src, dst, symlinks=False, ignore=None)
+        ignore = None
+        if ignore_patterns:
+            ignore = shutil.ignore_patterns(*ignore_patterns)
+
+        shutil.copytree(src, dst, symlinks=False, ignore=ignore)
 
     else:
         # Create dst if it does not exist.
@@ -282,13 +346,24 @@ def mkdir(directory):
     if exists(directory):
         return
 
-    os.makedirs(directory)
+    try:
+        os.makedirs(directory)
+    except OSError:
+        # The directory could be created by a parallel job.
+        if not os.path.isdir(directory):
+            raise
 
 
 def define_environment(env, value):
     '''
     Define environment.
     '''
+    job_env = get_job_environment()
+    # Parallel jobs don't modify the environment of each other.
+    if job_env is not None:
+        job_env[env] = str(value)
+        return
+
     os.environ[env] = str(value)
 
 
@@ -296,7 +371,9 @@ def get_environment(env):
     '''
     Get environment value.
     '''
-    return os.environ.get(env, '')
+    job_env = get_job_environment() or {}
+
+    return job_env.get(env, os.environ.get(env, ''))
 
 
 def unset_environment(env):
@@ -384,6 +461,48 @@ def remove_file(filename):
         pass
 
 
+def file_hash(filename):
+    '''
+    Calculate the SHA-1 checksum of the given file.
+    '''
+    checksum = hashlib.sha1()
+
+    with open(filename, 'rb') as file_p:
+        for chunk in iter(lambda: file_p.read(65536), b''):
+            checksum.update(chunk)
+
+    return checksum.hexdigest()
+
+
+def path_hash(path):
+    '''
+    Calculate the SHA-1 checksum of the given file or directory.
+    '''
+    if os.path.isfile(path):
+        return file_hash(path)
+
+    checksum = hashlib.sha1()
+
+    for root, dirs, files in os.walk(path):
+        # Walk the directories in a deterministic order.
+        dirs.sort()
+
+        for filename in sorted(files):
+            filepath = join(root, filename)
+
+            checksum.update(relpath(filepath, path))
+            checksum.update(file_hash(filepath))
+
+    return checksum.hexdigest()
+
+
+def data_hash(data):
+    '''
+    Calculate the SHA-1 checksum of the given JSON serializable data.
+    '''
+    return hashlib.sha1(json.dumps(data, sort_keys=True)).hexdigest()
+
+
 def last_commit_info(gitpath):
     '''
     Get last commit information about the submodules.
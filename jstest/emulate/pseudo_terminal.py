@@ -70,6 +70,8 @@ def _listener(port, prompt):
 
         if 'echo $?' in res:
             output = '0'
+        elif res.startswith('echo '):
+            output = res[len('echo '):].strip().replace('$?', '0')
         elif 'iotjs_build_info' in res:
             output = '{ "builtins": {}, "features": {}, "stability": "stable" }'
         else:
@@ -14,6 +14,7 @@
 
 import json
 import os
+import struct
 from threading import Thread
 
 from twisted.cred.portal import Portal
@@ -24,12 +25,17 @@ from twisted.cred.checkers import FilePasswordDB
 from twisted.conch.interfaces import IConchUser
 from twisted.conch.avatar import ConchUser
 from twisted.conch.ssh.channel import SSHChannel
+from twisted.conch.ssh.common import getNS
 from twisted.internet.protocol import Protocol
 from twisted.conch.ssh.session import SSHSessionProcessProtocol, wrapProtocol
 
 
 class SimpleSession(SSHChannel):
     name = 'session'
+    # The command of the exec request that reads its input from stdin.
+    batch_command = None
+    agent_command = None
+    stdin = ''
 
     @staticmethod
     def set_prompt(prompt):
@@ -41,8 +47,55 @@ class SimpleSession(SSHChannel):
     #pylint: enable=unused-argument
 
     def dataReceived(self, data):
-        cmd = str(data)
+        if self.batch_command:
+            self.stdin += str(data)
+            return
 
+        if self.agent_command:
+            self.stdin += str(data)
+
+            # The agent answers every line of the input.
+            while '\n' in self.stdin:
+                line, self.stdin = self.stdin.split('\n', 1)
+
+                if line.strip():
+                    self.write(self.run_entry(json.loads(line)))
+            return
+
+        self.write(self.execute(str(data)))
+        self.write(SimpleSession.prompt)
+
+    def eofReceived(self):
+        if self.agent_command:
+            self.exit()
+
+        if not self.batch_command:
+            return
+
+        # The messages of tester.py: its pid, then the start and the
+        # result of every test of the manifest.
+        self.write(json.dumps({'pid': os.getpid()}) + '\n')
+
+        for index, entry in enumerate(json.loads(self.stdin)):
+            test_id = entry.get('id', index)
+
+            self.write(json.dumps({'started': test_id}) + '\n')
+            self.write(self.run_entry(entry, test_id))
+
+        self.exit()
+
+    def run_entry(self, entry, test_id=None):
+        result = json.loads(self.execute(entry['testfile']))
+        result['testfile'] = entry['testfile']
+        result['duration'] = 0
+
+        if test_id is not None:
+            result['id'] = test_id
+
+        return json.dumps(result) + '\n'
+
+    @staticmethod
+    def execute(cmd):
         if 'iotjs_build_info' in cmd:
             result = {
                 'builtins': {},
@@ -60,8 +113,7 @@ class SimpleSession(SSHChannel):
                 'exitcode': int('fail' in cmd)
             }
 
-        self.write(json.dumps(result) + '\r\n')
-        self.write(SimpleSession.prompt)
+        return json.dumps(result) + '\r\n'
 
     # pylint: enable=invalid-name
     # pylint: disable=unused-argument
@@ -73,6 +125,27 @@ class SimpleSession(SSHChannel):
         self.client = transport
         return True
 
+    def request_exec(self, data):
+        cmd = getNS(data)[0]
+
+        # The tests of the manifest are executed at the end of the input.
+        if '--manifest' in cmd:
+            self.batch_command = cmd
+            return True
+
+        # The agent answers the requests until the end of the input.
+        if '--agent' in cmd:
+            self.agent_command = cmd
+            return True
+
+        self.write(self.execute(cmd))
+        self.exit()
+        return True
+
+    def exit(self):
+        self.conn.sendRequest(self, 'exit-status', struct.pack('>L', 0))
+        self.loseConnection()
+
     @staticmethod
     def request_pty_req(data):
         return True
@@ -0,0 +1,304 @@
+# Copyright 2018-present Samsung Electronics Co., Ltd. and other contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import collections
+import contextlib
+import Queue
+import threading
+import traceback
+
+import jstest
+from jstest import resources
+from jstest.builder.builder import Builder
+from jstest.common import console, utils
+from jstest.flasher import flasher
+from jstest.testresult import TestResult
+from jstest.testrunner.devices import lease
+from jstest.testrunner.testrunner import TestRunner
+
+
+class JobExecutor(object):
+    '''
+    Run the jobs of the runnable.jobs file in a bounded worker pool.
+    '''
+    def __init__(self, user_options):
+        self.user_options = user_options
+        self.workers = max(1, user_options.jobs)
+        self.pipeline = user_options.pipeline
+        self.commits = user_options.commits or [None]
+
+        # Jobs run on separate threads in parallel or pipelined mode.
+        self.threaded = self.workers > 1 or self.pipeline
+
+        # Every tested commit has its own result.
+        self.testresults = collections.OrderedDict()
+        for commit in self.commits:
+            self.testresults[commit] = TestResult(user_options, commit)
+
+        # All the created environments (used to restore the modules).
+        self.environments = []
+        self.failures = []
+
+        # The modules are patched in place (or the worktrees are created
+        # from the same repository), so only one job can prepare its sources
+        # at the same time. Without worktrees (only one job at a time) and on
+        # Tizen the builds also hold this lock (see parallel_build()).
+        self.source_lock = threading.Lock()
+        # Flashing and testing require exclusive access to the device.
+        self.device_lock = threading.Lock()
+        self.result_lock = threading.Lock()
+
+        # Built jobs that are waiting for the device in pipelined mode. The
+        # queue is bounded, so the builds can't get far ahead of the tests.
+        self.device_queue = Queue.Queue(maxsize=1)
+
+    def run(self, jobs):
+        '''
+        Execute all the given jobs and merge their results.
+        '''
+        tasks = Queue.Queue()
+
+        for commit in self.commits:
+            for job_options in jobs:
+                tasks.put(dict(job_options, commit=commit))
+
+        if not self.threaded:
+            self._build_worker(tasks)
+
+        else:
+            device_threads = []
+            if self.pipeline:
+                device_threads.append(self._start_thread(self._device_worker))
+
+            build_threads = []
+            for _ in range(min(self.workers, tasks.qsize())):
+                build_threads.append(self._start_thread(self._build_worker, tasks))
+
+            self._join_threads(build_threads)
+
+            # Stop the device stage when all the built jobs are tested.
+            if self.pipeline:
+                self.device_queue.put(None)
+                self._join_threads(device_threads)
+
+        if self.failures:
+            console.fail('Failed jobs: %s' % ', '.join(self.failures))
+
+    def upload(self):
+        '''
+        Upload the results of all the tested commits.
+        '''
+        for testresult in self.testresults.values():
+            testresult.upload()
+
+    def finalize(self):
+        '''
+        Revert all the patches and restore all the modified files.
+        '''
+        for env in self.environments:
+            resources.finalize(env)
+
+    def _build_worker(self, tasks):
+        '''
+        Take jobs from the queue and build them until the queue becomes empty.
+        '''
+        while not self.failures:
+            try:
+                job_options = tasks.get_nowait()
+            except Queue.Empty:
+                return
+
+            try:
+                job = self._create_job(job_options)
+                self._build_job(job)
+
+                # Jobs that don't need the device are finished.
+                if job['env'].options.no_flash and job['env'].options.no_test:
+                    self._finish_job(job)
+
+                elif self.pipeline:
+                    self.device_queue.put(job)
+
+                else:
+                    with self.device_lock:
+                        self._test_job(job)
+
+                    self._finish_job(job)
+
+            except Exception:
+                # Stop at the first failure if the jobs are executed one by one.
+                if not self.threaded:
+                    raise
+
+                self._handle_failure(job_options)
+
+    def _device_worker(self):
+        '''
+        Flash and test the built jobs one after the other.
+        '''
+        while True:
+            job = self.device_queue.get()
+
+            # The build stage is finished.
+            if job is None:
+                return
+
+            # Keep consuming the queue to not block the build stage.
+            if self.failures:
+                continue
+
+            try:
+                self._test_job(job)
+                self._finish_job(job)
+
+            except Exception:
+                self._handle_failure(job['env'].options)
+
+    def _create_job(self, job_options):
+        '''
+        Create the testing environment of the job.
+        '''
+        env = jstest.create_testing_environment(self.user_options, job_options)
+
+        with self.result_lock:
+            self.environments.append(env)
+
+        job = {
+            'env': env,
+            'log': None,
+            'environ': None
+        }
+
+        if self.threaded:
+            job['environ'] = {}
+            job['log'] = utils.join(env.paths.result, 'logs', env.options.commit or '',
+                                    '%s.log' % env.options.id)
+
+            utils.write_file(job['log'], '')
+
+            console.info('Job %s is started (log: %s)' % (self._job_name(env.options), job['log']))
+
+        return job
+
+    def _build_job(self, job):
+        '''
+        Prepare the sources and build the job.
+        '''
+        env = job['env']
+
+        with self._job_context(job):
+            with self.source_lock:
+                builder = Builder(env)
+
+                if not self.parallel_build(env):
+                    builder.build()
+
+            if self.parallel_build(env):
+                builder.build()
+
+    def _test_job(self, job):
+        '''
+        Flash the device and run the tests of the job.
+        '''
+        env = job['env']
+
+        # Other jstest processes can't use the boards of the job meanwhile.
+        with self._job_context(job), lease.lease_boards(env):
+            flasher.flash(env)
+
+            testrunner = TestRunner(env)
+            testrunner.run()
+            testrunner.save()
+
+    def _finish_job(self, job):
+        '''
+        Save the result of the job.
+        '''
+        env = job['env']
+
+        with self.result_lock:
+            self.testresults[env.options.commit].append(env.options.id, env.paths.builddir)
+
+        if self.threaded:
+            console.info('Job %s is finished' % self._job_name(env.options))
+
+    def _handle_failure(self, job_options):
+        '''
+        Register the failed job.
+        '''
+        traceback.print_exc()
+
+        with self.result_lock:
+            self.failures.append(self._job_name(job_options))
+
+    @staticmethod
+    @contextlib.contextmanager
+    def _job_context(job):
+        '''
+        Redirect the output and the environment variables to the job.
+        '''
+        log_file = open(job['log'], 'a') if job['log'] else None
+
+        utils.set_job_log(log_file)
+        utils.set_job_environment(job['environ'])
+
+        try:
+            yield
+
+        finally:
+            utils.set_job_log(None)
+            utils.set_job_environment(None)
+
+            if log_file:
+                log_file.close()
+
+    @staticmethod
+    def _job_name(job_options):
+        '''
+        Create a printable name from the job id and the tested commit.
+        '''
+        if job_options.get('commit'):
+            return '%s@%s' % (job_options['id'], job_options['commit'])
+
+        return job_options['id']
+
+    @staticmethod
+    def _start_thread(target, *args):
+        '''
+        Start a daemon thread.
+        '''
+        thread = threading.Thread(target=target, args=args)
+        thread.daemon = True
+        thread.start()
+
+        return thread
+
+    @staticmethod
+    def _join_threads(threads):
+        '''
+        Wait for the given threads.
+        '''
+        for thread in threads:
+            # Note: join with timeout keeps the main thread responsive
+            # to keyboard interrupts.
+            while thread.is_alive():
+                thread.join(1)
+
+    @staticmethod
+    def parallel_build(env):
+        '''
+        Check whether the job can be built in parallel with the other jobs.
+        '''
+        # Note: the Tizen build root is shared by all the jobs.
+        return env.options.worktrees and env.options.device != 'rpi3'
@@ -12,7 +12,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from jstest.common import utils, paths
+from jstest.common import console, utils, paths
+from jstest.testrunner import devices
 
 
 def flash(env):
@@ -22,12 +23,32 @@ def flash(env):
     if env.options.no_flash:
         return
 
-    config = utils.read_config_file(paths.FLASH_CONFIG_FILE, env)
-    # Get the device specific flash instructions.
-    flash_info = config[env.options.device]
+    flash_infos = []
 
-    # Do the initialization steps.
-    for command in flash_info.get('init', []):
-        utils.execute_config_command(command)
-    # Flash the device.
-    utils.execute_config_command(flash_info.get('flash'))
+    for board_env in devices.board_environments(env):
+        config = utils.read_config_file(paths.FLASH_CONFIG_FILE, board_env)
+        # Get the device specific flash instructions.
+        flash_info = config[env.options.device]
+
+        # The same instructions would flash the same board again (e.g. st-flash
+        # without --serial, make download of TizenRT), and the other boards
+        # would run the tests with their old firmware.
+        if flash_info in flash_infos:
+            console.fail('Board %s can not be selected by the flash tool. Flash the boards '
+                         'one by one or use --no-flash.'
+                         % (board_env.options.ip or board_env.options.device_id))
+
+        flash_infos.append(flash_info)
+
+    for flash_info in flash_infos:
+        # Do the initialization steps.
+        for command in flash_info.get('init', []):
+            utils.execute_config_command(command)
+
+        # Flash the device (the conditions select one of the alternatives).
+        flash_commands = flash_info.get('flash')
+        if isinstance(flash_commands, dict):
+            flash_commands = [flash_commands]
+
+        for command in flash_commands:
+            utils.execute_config_command(command)
@@ -21,16 +21,36 @@ def fetch_modules(env):
     Download all the required modules.
     '''
     for module in env.modules.values():
+        # In case of worktrees, the original repository is downloaded.
+        fetch_dir = module.get('origin', module['src'])
+
         # Skip if the module is already exist.
-        if utils.exists(module['src']):
+        if utils.exists(fetch_dir):
             continue
 
         fetch_url = module['url']
-        fetch_dir = module['src']
 
         utils.execute('.', 'git', ['clone', fetch_url, fetch_dir])
-        utils.execute(module['src'], 'git', ['checkout', module['version']])
-        utils.execute(module['src'], 'git', ['submodule', 'update', '--init'])
+        utils.execute(fetch_dir, 'git', ['checkout', module['version']])
+        utils.execute(fetch_dir, 'git', ['submodule', 'update', '--init'])
+
+
+def config_module(module, revert=False):
+    '''
+    Configure the given module.
+    '''
+    for config in module.get('config', []):
+        # Do not configure if the result of the condition is false.
+        condition = config.get('condition', 'True')
+
+        if not eval(condition):
+            continue
+
+        if revert:
+            utils.restore_file(module['src'], config['dst'])
+
+        else:
+            utils.symlink(config['src'], config['dst'])
 
 
 def config_modules(env, revert=False):
@@ -38,18 +58,34 @@ def config_modules(env, revert=False):
     Configure all the required modules.
     '''
     for module in env.modules.values():
-        for config in module.get('config', []):
-            # Do not configure if the result of the condition is false.
-            condition = config.get('condition', 'True')
+        config_module(module, revert)
 
-            if not eval(condition):
-                continue
 
-            if revert:
-                utils.restore_file(module['src'], config['dst'])
+def read_patches(env, module):
+    '''
+    Get the patches that belong to the current job.
+    '''
+    patches = []
 
-            else:
-                utils.symlink(config['src'], config['dst'])
+    for patch in module.get('patches', {}).get(env.options.id, []):
+        # Do not patch if the result of the condition is false.
+        condition = patch.get('condition', 'True')
+
+        if eval(condition):
+            patches.append(patch)
+
+    return patches
+
+
+def patch_module(env, module, revert=False):
+    '''
+    Modify the source code of the given module.
+    '''
+    for patch in read_patches(env, module):
+        # By default, the project is patched. If there is a
+        # submodule information, the subproject will be patched.
+        project = patch.get('submodule', module['src'])
+        utils.patch(project, patch['file'], revert)
 
 
 def patch_modules(env, revert=False):
@@ -57,18 +93,77 @@ def patch_modules(env, revert=False):
     Modify the source code of the required modules.
     '''
     for module in env.modules.values():
-        # Get patches that belong to the current job.
-        for patch in module.get('patches', {}).get(env.options.id, []):
-            # Do not patch if the result of the condition is false.
-            condition = patch.get('condition', 'True')
+        patch_module(env, module, revert)
+
+
+def worktree_stamp(env, module, commit):
+    '''
+    Create a checksum from everything that modifies the source tree of the module.
+    '''
+    configs = []
+    for config in module.get('config', []):
+        if eval(config.get('condition', 'True')):
+            configs.append([config['src'], config['dst']])
 
-            if not eval(condition):
-                continue
+    patches = []
+    for patch in read_patches(env, module):
+        patches.append([patch.get('submodule', ''), patch['file'], utils.file_hash(patch['file'])])
 
-            # By default, the project is patched. If there is a
-            # submodule information, the subproject will be patched.
-            project = patch.get('submodule', module['src'])
-            utils.patch(project, patch['file'], revert)
+    return utils.data_hash({
+        'commit': commit,
+        'configs': configs,
+        'patches': patches
+    })
+
+
+def reset_worktree(module, commit):
+    '''
+    Restore the original state of the worktree.
+    '''
+    src = module['src']
+
+    utils.execute(src, 'git', ['checkout', '--force', '--detach', commit], quiet=True)
+    utils.execute(src, 'git', ['clean', '-fdx'], quiet=True)
+    utils.execute(src, 'git', ['submodule', 'update', '--init', '--force'], quiet=True)
+    utils.execute(src, 'git', ['submodule', 'foreach', '--recursive', 'git clean -fdx'], quiet=True)
+
+
+def prepare_worktrees(env):
+    '''
+    Create (or reuse) the source trees that belong to the current job.
+    '''
+    for name, module in env.modules.iteritems():
+        # The application is also listed under its own name.
+        if name == 'app':
+            continue
+
+        commit = utils.last_commit_info(module['origin'])['commit']
+        # The application could be tested on a user defined commit.
+        if name == env.options.app and env.options.get('commit'):
+            commit = env.options.commit
+
+        if not utils.exists(module['src']):
+            utils.mkdir(utils.dirname(module['src']))
+            utils.execute(module['origin'], 'git', ['worktree', 'add', '--detach',
+                                                    module['src'], commit])
+            utils.execute(module['src'], 'git', ['submodule', 'update', '--init'])
+
+        stamp_file = module['src'] + '.stamp'
+        stamp = worktree_stamp(env, module, commit)
+
+        # The worktree is already prepared for the current configuration.
+        if utils.exists(stamp_file) and utils.read_file(stamp_file) == stamp:
+            continue
+
+        reset_worktree(module, commit)
+        # The in-tree build state (e.g. the NuttX configuration) is removed
+        # by the reset, so the next incremental build has to be a clean one.
+        utils.remove_file(env.paths.builddir + '.config-hash')
+
+        config_module(module)
+        patch_module(env, module)
+
+        utils.write_file(stamp_file, stamp)
 
 
 def initialize(env):
@@ -76,6 +171,11 @@ def initialize(env):
     Public method to initialize the project.
     '''
     fetch_modules(env)
+
+    if env.options.worktrees:
+        prepare_worktrees(env)
+        return
+
     config_modules(env)
     patch_modules(env)
 
@@ -84,5 +184,9 @@ def finalize(env):
     '''
     Public method to restore the project files.
     '''
+    # The worktrees are kept in their prepared state for the next run.
+    if env.options.worktrees:
+        return
+
     config_modules(env, revert=True)
     patch_modules(env, revert=True)
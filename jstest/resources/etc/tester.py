@@ -16,11 +16,17 @@
 # limitations under the License.
 
 import argparse
+import copy
+import ctypes
 import json
 import os
 import re
+import shutil
+import signal
 import subprocess
 import sys
+import threading
+import time
 
 
 # Recommended build command for IoT.js on RPi2:
@@ -37,6 +43,18 @@ FREYA_BIN = os.path.join(REMOTE_TESTRUNNER_PATH, 'valgrind_freya', 'vg-in-place'
 FREYA_LOG = os.path.join(REMOTE_TESTRUNNER_PATH, 'freya.log')
 FREYA_CONFIG = os.path.join(REMOTE_TESTRUNNER_PATH, 'iotjs-freya.config')
 
+# The malloc interposer library (see jstest_memstat_preload.c) writes
+# the peak of the system heap into the log file.
+MEMSTAT_LIB = os.path.join(REMOTE_TESTRUNNER_PATH, 'libjstest_memstat.so')
+MEMSTAT_LOG = os.path.join(REMOTE_TESTRUNNER_PATH, 'memstat.log')
+
+# Working directories of the concurrent tests.
+SLOTS_PATH = os.path.join(REMOTE_TESTRUNNER_PATH, 'slots')
+
+# Folders of the working directory that the tests write (e.g. the fs tests),
+# every slot has its own copy of them.
+WRITABLE_DIRS = ['resources']
+
 
 def is_executable(fpath):
     '''
@@ -56,27 +74,49 @@ def check_tools(options):
     '''
     Checking resources before testing.
     '''
-    if options.cmd.endswith('iotjs'):
-        if not options.no_memstat and not is_executable(FREYA_BIN):
+    if uses_freya(options):
+        if not is_executable(FREYA_BIN):
             sys.exit('The Freya tool is not suitable for testing!')
 
-        if not options.no_memstat and not is_readable(FREYA_CONFIG):
+        if not is_readable(FREYA_CONFIG):
             sys.exit('The Freya config file is not available!')
 
         # Remove the last Freya log file.
         if os.path.exists(FREYA_LOG):
             os.remove(FREYA_LOG)
 
+    elif options.cmd.endswith('iotjs') and not options.no_memstat:
+        if not is_readable(MEMSTAT_LIB):
+            sys.exit('The memstat library is not available!')
+
     if not is_executable(options.cmd):
         sys.exit('The application is not suitable for testing!')
 
-    if not is_readable(options.testfile):
+    # Note: the testfiles of a manifest or the agent are checked one by one.
+    if not (options.manifest or options.agent) and not is_readable(options.testfile):
         sys.exit('Testfile is not readable!')
 
 
-def execute(cwd, cmd, args=None):
+def uses_freya(options):
+    '''
+    Check whether the system heap is measured by the Freya tool.
+    '''
+    return options.cmd.endswith('iotjs') and options.freya and not options.no_memstat
+
+
+class TestTimeout(Exception):
     '''
-    Run the given command and return its output.
+    Exception that is raised when the test runs longer than its time limit.
+    '''
+    def __init__(self, output):
+        Exception.__init__(self, 'Test timeout')
+        self.output = output
+
+
+def execute(cwd, cmd, args=None, env=None, timeout=None):
+    '''
+    Run the given command and return its output. The command is
+    killed if it runs longer than the timeout (in seconds).
     '''
     if args is None:
         args = []
@@ -84,22 +124,49 @@ def execute(cwd, cmd, args=None):
     stdout = subprocess.PIPE
     stderr = subprocess.STDOUT
 
-    process = subprocess.Popen([cmd] + args, stdout=stdout, stderr=stderr, cwd=cwd)
+    # Note: the command runs in its own process group, so its child
+    # processes (that keep the output pipe open) are killed as well.
+    process = subprocess.Popen([cmd] + args, stdout=stdout, stderr=stderr, cwd=cwd, env=env,
+                               preexec_fn=os.setsid)
+    killed = []
+
+    def kill():
+        '''
+        Stop the command that is out of time.
+        '''
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+            killed.append(True)
+        except OSError:
+            # The process is already finished.
+            pass
+
+    timer = None
+    if timeout:
+        timer = threading.Timer(timeout, kill)
+        timer.daemon = True
+        timer.start()
 
     output = process.communicate()[0]
     exitcode = process.returncode
 
+    if timer:
+        timer.cancel()
+
+    if killed:
+        raise TestTimeout(output.decode('utf-8'))
+
     return output.decode('utf-8'), exitcode
 
 
-def process_freya_output():
+def process_freya_output(freya_log=FREYA_LOG):
     '''
     Process the Freya log file to get the peak memory usage.
     '''
-    if not is_readable(FREYA_LOG):
+    if not is_readable(freya_log):
         sys.exit('Missing Freya log file!')
 
-    measurement = open(FREYA_LOG, 'r').read()
+    measurement = open(freya_log, 'r').read()
 
     pattern = re.compile('\[0\] Peak:.*?(\d+)b.*\nGroup: Total')
     match = pattern.search(measurement)
@@ -112,6 +179,55 @@ def process_freya_output():
     return mempeak
 
 
+def process_memstat_output(memstat_log=MEMSTAT_LOG):
+    '''
+    Process the log file of the malloc interposer library to get the peak memory usage.
+    '''
+    # Note: the log file is not created if the process is crashed.
+    if not is_readable(memstat_log):
+        return 'n/a'
+
+    match = re.search(r'Malloc peak allocated: (\d+) bytes', open(memstat_log, 'r').read())
+
+    if match:
+        return int(match.group(1))
+
+    return 'n/a'
+
+
+def update_freya_config():
+    '''
+    Insert the glibc version into the Freya config file (only once per deployment).
+    '''
+    if update_freya_config.done:
+        return
+
+    with open(FREYA_CONFIG, 'r') as config_file:
+        config = config_file.read()
+
+    # The config is already resolved by an earlier tester call.
+    if '%{glibc-version}' in config:
+        # Note: the version is queried from the loaded glibc instead of 'ldd --version'.
+        get_libc_version = ctypes.CDLL(None).gnu_get_libc_version
+        get_libc_version.restype = ctypes.c_char_p
+        gnu_libc_version = get_libc_version().decode('utf-8')
+
+        # Note: concurrent tester calls could resolve the config at the same
+        # time, so the complete file is moved into its place atomically.
+        temp_file = '%s.%d' % (FREYA_CONFIG, os.getpid())
+
+        with open(temp_file, 'w') as config_file:
+            config_file.write(config.replace('%{glibc-version}', gnu_libc_version))
+
+        os.rename(temp_file, FREYA_CONFIG)
+
+    update_freya_config.done = True
+
+
+# The Freya config file is resolved by the first test after the deployment.
+update_freya_config.done = False
+
+
 def run_jerry(options):
     '''
     Run JerryScript with memcheck.
@@ -126,7 +242,7 @@ def run_jerry(options):
         args.append('--debug-port')
         args.append('%s' % options.debug_port)
 
-    output, exitcode = execute(options.cwd, options.cmd, args)
+    output, exitcode = execute(options.cwd, options.cmd, args, timeout=options.timeout)
 
     mempeak = 'n/a'
     stack = 'n/a'
@@ -174,8 +290,19 @@ def run_iotjs(options):
 
     args.append(options.testfile)
 
-    # 1. Run IoT.js without Freya to get its output and exit value.
-    output, exitcode = execute(options.cwd, options.cmd, args)
+    # Concurrent tests write separate log files.
+    memstat_log = getattr(options, 'memstat_log', MEMSTAT_LOG)
+    environment = None
+
+    if not options.no_memstat and not options.freya:
+        if os.path.exists(memstat_log):
+            os.remove(memstat_log)
+
+        # The malloc interposer measures the system heap in the same run.
+        environment = dict(os.environ, LD_PRELOAD=MEMSTAT_LIB, JSTEST_MEMSTAT_FILE=memstat_log)
+
+    # 1. Run IoT.js (without Freya) to get its output and exit value.
+    output, exitcode = execute(options.cwd, options.cmd, args, environment, options.timeout)
 
     jerry_peak_alloc = 'n/a'
     stack_peak = 'n/a'
@@ -200,28 +327,35 @@ def run_iotjs(options):
         # Remove memstat from the output.
         output, _ = output.split("Heap stats:", 1)
 
-    if not options.no_memstat:
+    if environment:
+        malloc_peak = process_memstat_output(memstat_log)
+
+    elif uses_freya(options):
+        # Concurrent tests write separate log files.
+        freya_log = getattr(options, 'freya_log', FREYA_LOG)
+
+        if os.path.exists(freya_log):
+            os.remove(freya_log)
+
         # Setup the valgrind options
         valgrind_options = [
             '--tool=freya',
-            '--freya-out-file=%s' % FREYA_LOG,
+            '--freya-out-file=%s' % freya_log,
             '--config=%s' % FREYA_CONFIG,
             options.cmd,
             options.testfile
         ]
 
-        # 2. Update the configuration file of Freya:
-        ldd_output, _ = execute(options.cwd, 'ldd', ['--version'])
-        gnu_libc_version = ldd_output.splitlines()[0].split()[-1]
-
-        sed_options = ['-ie', 's/%%{glibc-version}/%s/g' % gnu_libc_version, 'iotjs-freya.config']
-        execute(REMOTE_TESTRUNNER_PATH, 'sed', sed_options)
+        # 2. Update the configuration file of Freya (if not yet done):
+        update_freya_config()
 
         # 3. Run IoT.js with Freya to create a log file with the memory information.
+        # Note: the test is already finished in time, so the (much slower)
+        # Valgrind run is not limited.
         execute(options.cwd, FREYA_BIN, valgrind_options)
 
         # 4. Process the created log file to get the peak memory.
-        malloc_peak = process_freya_output()
+        malloc_peak = process_freya_output(freya_log)
 
     return {
         'memstat': {
@@ -257,13 +391,255 @@ def parse_arguments():
                         action='store_true', default=False,
                         help='do not measure memory statistics (default: %(default)s)')
 
+    parser.add_argument('--freya',
+                        action='store_true', default=False,
+                        help='measure the system heap with Freya instead of the '
+                             'malloc interposer library (default: %(default)s)')
+
     parser.add_argument('--iotjs-build-info',
                         action='store_true', default=False,
                         help='Run the buildinfo script for iotjs')
 
+    parser.add_argument('--timeout', metavar='SEC', type=float,
+                        help='kill the application if the test runs longer than this')
+
+    parser.add_argument('--jobs', metavar='N', type=int, default=1,
+                        help='number of the concurrent tests of the manifest '
+                             '(default: %(default)s)')
+
+    parser.add_argument('--agent',
+                        action='store_true', default=False,
+                        help='run the tests that are received as JSON lines on stdin')
+
+    parser.add_argument('--manifest', metavar='file',
+                        help='JSON list of the tests to run (- for stdin), '
+                             'the results are printed as JSON lines')
+
     return parser.parse_args()
 
 
+def run_test(options):
+    '''
+    Run the test with the selected application.
+    '''
+    try:
+        if options.cmd.endswith('iotjs'):
+            return run_iotjs(options)
+
+        if options.cmd.endswith('jerry'):
+            return run_jerry(options)
+
+    except TestTimeout as timeout:
+        return {
+            'memstat': {
+                'heap-jerry': 'n/a',
+                'heap-system': 'n/a',
+                'stack': 'n/a'
+            },
+            'output': timeout.output,
+            'exitcode': None,
+            'timeout': True
+        }
+
+    return error_result(options.testfile, 'Unsupported application: %s' % options.cmd)
+
+
+def run_agent(arguments):
+    '''
+    Run the tests that are received as JSON lines on stdin until the end of
+    the input. The results are printed as JSON lines.
+    '''
+    # The state is kept between the tests, so the config is updated only once.
+    if uses_freya(arguments):
+        update_freya_config()
+
+    while True:
+        # Note: iterating over stdin would wait for more input lines.
+        line = sys.stdin.readline()
+
+        if not line:
+            break
+
+        if not line.strip():
+            continue
+
+        print(json.dumps(run_entry(arguments, json.loads(line))))
+        sys.stdout.flush()
+
+
+def create_slots(options):
+    '''
+    Create a separate working directory for every concurrent test. The
+    directories link to the content of the original working directory,
+    except the writable folders that are copied.
+    '''
+    slots = []
+
+    for slot in range(options.jobs):
+        slot_dir = os.path.join(SLOTS_PATH, str(slot))
+
+        if os.path.isdir(slot_dir):
+            shutil.rmtree(slot_dir)
+        os.makedirs(slot_dir)
+
+        for name in os.listdir(options.cwd):
+            src = os.path.join(options.cwd, name)
+            dst = os.path.join(slot_dir, name)
+
+            if name in WRITABLE_DIRS and os.path.isdir(src):
+                shutil.copytree(src, dst, symlinks=True)
+            else:
+                os.symlink(src, dst)
+
+        slots.append({
+            'cwd': slot_dir,
+            'freya_log': os.path.join(slot_dir, 'freya.log'),
+            'memstat_log': os.path.join(slot_dir, 'memstat.log'),
+            'debug_port': int(options.debug_port) + slot if options.debug_port else None
+        })
+
+    return slots
+
+
+def run_entry(options, entry, slot=None):
+    '''
+    Run a test of the manifest and return its result.
+    '''
+    options = copy.copy(options)
+    options.testfile = entry['testfile']
+    options.timeout = entry.get('timeout') or options.timeout
+
+    if slot:
+        for key, value in slot.items():
+            setattr(options, key, value)
+
+    # The entries can override the options of the script.
+    for key, value in entry.get('flags', {}).items():
+        setattr(options, key.replace('-', '_'), value)
+
+    start_time = time.time()
+
+    if is_readable(options.testfile):
+        results = run_test(options)
+    else:
+        results = error_result(options.testfile, 'Testfile is not readable!')
+
+    results['testfile'] = options.testfile
+    results['duration'] = time.time() - start_time
+
+    return results
+
+
+def error_result(testfile, output):
+    '''
+    Create the result of a test that couldn't be executed.
+    '''
+    return {
+        'memstat': {
+            'heap-jerry': 'n/a',
+            'heap-system': 'n/a',
+            'stack': 'n/a'
+        },
+        'output': output,
+        'exitcode': 1,
+        'testfile': testfile,
+        'duration': 0
+    }
+
+
+def run_manifest(arguments):
+    '''
+    Run all the tests of the manifest and print their results as JSON lines.
+
+    The first line contains the pid of the script, then a line is printed
+    when a test is started ({"started": id}) and when it is finished (the
+    result with the id of the entry), so the caller knows which tests are
+    running if the device stops responding.
+    '''
+    if arguments.manifest == '-':
+        manifest = json.load(sys.stdin)
+    else:
+        with open(arguments.manifest, 'r') as manifest_file:
+            manifest = json.load(manifest_file)
+
+    print_message({'pid': os.getpid()})
+
+    if arguments.jobs < 2:
+        for index, entry in enumerate(manifest):
+            print_message({'started': entry.get('id', index)})
+
+            result = run_entry(arguments, entry)
+            result['id'] = entry.get('id', index)
+
+            # Every result is sent as soon as the test is finished.
+            print_message(result)
+
+        return
+
+    # The config is shared by the concurrent tests, so it is updated first.
+    if uses_freya(arguments):
+        update_freya_config()
+
+    free_slots = create_slots(arguments)
+    results = [None] * len(manifest)
+    condition = threading.Condition()
+
+    def worker(index, slot):
+        '''
+        Run the test on a separate thread and release its slot.
+        '''
+        entry = manifest[index]
+        result = None
+
+        try:
+            result = run_entry(arguments, entry, slot)
+
+        except (Exception, SystemExit) as error:
+            result = error_result(entry['testfile'], 'tester.py error: %s' % error)
+
+        finally:
+            # The main thread waits for the result even if the test is failed.
+            with condition:
+                results[index] = result or error_result(entry['testfile'], 'tester.py error')
+                results[index]['id'] = entry.get('id', index)
+
+                print_message(results[index])
+
+                free_slots.append(slot)
+                condition.notify_all()
+
+    with condition:
+        for index, entry in enumerate(manifest):
+            # Tests that use exclusive resources (e.g. network ports, GPIO)
+            # wait until the running tests are finished.
+            while not free_slots or (entry.get('exclusive') and
+                                     len(free_slots) < arguments.jobs):
+                condition.wait()
+
+            slot = free_slots.pop(0)
+
+            print_message({'started': entry.get('id', index)})
+
+            thread = threading.Thread(target=worker, args=(index, slot))
+            thread.daemon = True
+            thread.start()
+
+            # Exclusive tests also block the following tests.
+            while entry.get('exclusive') and results[index] is None:
+                condition.wait()
+
+        while None in results:
+            condition.wait()
+
+
+def print_message(message):
+    '''
+    Print a JSON line for the caller.
+    '''
+    print(json.dumps(message))
+    sys.stdout.flush()
+
+
 def main():
     '''
     Main function of the tester script.
@@ -272,11 +648,15 @@ def main():
 
     check_tools(arguments)
 
-    if arguments.cmd.endswith('iotjs'):
-        results = run_iotjs(arguments)
+    if arguments.manifest:
+        run_manifest(arguments)
+        return
+
+    if arguments.agent:
+        run_agent(arguments)
+        return
 
-    if arguments.cmd.endswith('jerry'):
-        results = run_jerry(arguments)
+    results = run_test(arguments)
 
     # Don't remove this print function. The result will be on the
     # SSH socket when testing remotely.
@@ -0,0 +1,195 @@
+/* Copyright 2018-present Samsung Electronics Co., Ltd. and other contributors
+ *
+ * Licensed under the Apache License, Version 2.0 (the "License");
+ * you may not use this file except in compliance with the License.
+ * You may obtain a copy of the License at
+ *
+ *     http://www.apache.org/licenses/LICENSE-2.0
+ *
+ * Unless required by applicable law or agreed to in writing, software
+ * distributed under the License is distributed on an "AS IS" BASIS
+ * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ * See the License for the specific language governing permissions and
+ * limitations under the License.
+ */
+
+/*
+ * Memory statistic for the system allocator on Linux (glibc).
+ *
+ * The library is loaded by LD_PRELOAD and interposes the allocator functions,
+ * so the peak memory usage is measured while the test runs natively, without
+ * a second run under Valgrind (Freya). The size of the chunks is read by
+ * malloc_usable_size, so the padding of the allocator is also counted.
+ *
+ * The peak is written into the file that the JSTEST_MEMSTAT_FILE environment
+ * variable defines when the process exits:
+ *
+ *     Malloc peak allocated: <size> bytes
+ *
+ * Build:
+ *
+ *     arm-linux-gnueabihf-gcc -shared -fPIC -O2 -o libjstest_memstat.so \
+ *                             jstest_memstat_preload.c
+ */
+#include <errno.h>
+#include <fcntl.h>
+#include <malloc.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <unistd.h>
+
+extern void* __libc_malloc(size_t size);
+extern void* __libc_calloc(size_t n, size_t elem_size);
+extern void* __libc_realloc(void* oldmem, size_t size);
+extern void* __libc_memalign(size_t alignment, size_t size);
+extern void __libc_free(void* mem);
+
+static size_t allocated_bytes = 0;
+static size_t peak_allocated_bytes = 0;
+
+
+static void mem_stat_alloc(void* ptr)
+{
+  size_t allocated;
+  size_t peak;
+
+  if (ptr == NULL) {
+    return;
+  }
+
+  allocated = __atomic_add_fetch(&allocated_bytes, malloc_usable_size(ptr),
+                                 __ATOMIC_RELAXED);
+  peak = __atomic_load_n(&peak_allocated_bytes, __ATOMIC_RELAXED);
+
+  // Note: the threads of the process (e.g. libuv workers) can allocate
+  // at the same time, so the peak is updated by compare-and-swap.
+  while (allocated > peak &&
+         !__atomic_compare_exchange_n(&peak_allocated_bytes, &peak, allocated, 1,
+                                      __ATOMIC_RELAXED, __ATOMIC_RELAXED)) {
+  }
+}
+
+
+static void mem_stat_free(void* ptr)
+{
+  if (ptr == NULL) {
+    return;
+  }
+
+  __atomic_sub_fetch(&allocated_bytes, malloc_usable_size(ptr), __ATOMIC_RELAXED);
+}
+
+
+void* malloc(size_t size) {
+  void* mem = __libc_malloc(size);
+
+  mem_stat_alloc(mem);
+
+  return mem;
+}
+
+
+void* calloc(size_t n, size_t elem_size) {
+  void* mem = __libc_calloc(n, elem_size);
+
+  mem_stat_alloc(mem);
+
+  return mem;
+}
+
+
+void* realloc(void* oldmem, size_t size) {
+  size_t oldsize = oldmem ? malloc_usable_size(oldmem) : 0;
+  void* newmem = __libc_realloc(oldmem, size);
+
+  // The old chunk is kept if the reallocation is failed.
+  if (newmem == NULL && size != 0) {
+    return NULL;
+  }
+
+  __atomic_sub_fetch(&allocated_bytes, oldsize, __ATOMIC_RELAXED);
+  mem_stat_alloc(newmem);
+
+  return newmem;
+}
+
+
+void* memalign(size_t alignment, size_t size) {
+  void* mem = __libc_memalign(alignment, size);
+
+  mem_stat_alloc(mem);
+
+  return mem;
+}
+
+
+void* aligned_alloc(size_t alignment, size_t size) {
+  return memalign(alignment, size);
+}
+
+
+void* valloc(size_t size) {
+  return memalign(sysconf(_SC_PAGESIZE), size);
+}
+
+
+void* pvalloc(size_t size) {
+  size_t pagesize = sysconf(_SC_PAGESIZE);
+
+  // The size is rounded up to the next multiple of the page size.
+  return memalign(pagesize, (size + pagesize - 1) & ~(pagesize - 1));
+}
+
+
+int posix_memalign(void** memptr, size_t alignment, size_t size) {
+  void* mem;
+
+  if (alignment % sizeof(void*) != 0 || (alignment & (alignment - 1)) != 0) {
+    return EINVAL;
+  }
+
+  mem = memalign(alignment, size);
+
+  if (mem == NULL) {
+    return ENOMEM;
+  }
+
+  *memptr = mem;
+
+  return 0;
+}
+
+
+void free(void* mem) {
+  mem_stat_free(mem);
+
+  __libc_free(mem);
+}
+
+
+__attribute__((destructor))
+static void print_mem_stat() {
+  char buffer[64];
+  const char* filename = getenv("JSTEST_MEMSTAT_FILE");
+  int length;
+  int fd;
+
+  if (filename == NULL) {
+    return;
+  }
+
+  fd = open(filename, O_WRONLY | O_CREAT | O_TRUNC, 0644);
+
+  if (fd < 0) {
+    return;
+  }
+
+  length = snprintf(buffer, sizeof(buffer), "Malloc peak allocated: %zu bytes\n",
+                    __atomic_load_n(&peak_allocated_bytes, __ATOMIC_RELAXED));
+
+  if (write(fd, buffer, length) != length) {
+    // Nothing to do, the missing value is reported as n/a.
+  }
+
+  close(fd);
+}
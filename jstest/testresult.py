@@ -22,8 +22,9 @@ class TestResult(object):
     '''
     Basic class to store the build and testrunner results.
     '''
-    def __init__(self, options):
+    def __init__(self, options, commit=None):
         self.options = options
+        self.commit = commit
         self.results = {}
 
     def append(self, job_id, build_path):
@@ -74,7 +75,12 @@ class TestResult(object):
                 result['date'] = bin_data['last-commit-date']
 
         filepath = utils.join(paths.RESULT_PATH, self.options.app, self.options.device)
-        filename = utils.join(filepath, utils.current_date() + '.json')
+        filename = utils.current_date()
+        # Results of different commits could be created at the same time.
+        if self.commit:
+            filename += '_' + self.commit
+
+        filename = utils.join(filepath, filename + '.json')
         # Save the content info a result file.
         utils.write_json_file(filename, result)
 
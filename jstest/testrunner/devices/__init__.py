@@ -12,6 +12,9 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import copy
+
+from jstest.common import console
 from jstest.testrunner.devices import artik053, rpi3, rpi2, stm32f4dis
 
 
@@ -30,3 +33,61 @@ def create_device(env):
     device_class = DEVICES[env.options.device]
 
     return device_class(env)
+
+
+def board_environments(env):
+    '''
+    Create a testing environment for every board of the device type.
+    '''
+    board_envs = []
+    stlink_serials = env.options.stlink_serials
+
+    # Boards are identified by their IP addresses in case of SSH and
+    # telnet communication, otherwise by their serial device IDs.
+    if env.options.ip:
+        for ip_addr in env.options.ips:
+            board_env = copy.deepcopy(env)
+            board_env.options.ip = ip_addr
+            board_envs.append(board_env)
+
+    else:
+        for device_id in env.options.device_ids:
+            board_env = copy.deepcopy(env)
+            board_env.options.device_id = device_id
+            board_envs.append(board_env)
+
+    for index, board_env in enumerate(board_envs):
+        # The programmer of the board (used by the flasher and the reset).
+        board_env.options.stlink_serial = None
+        if index < len(stlink_serials):
+            board_env.options.stlink_serial = stlink_serials[index]
+
+    return board_envs
+
+
+def check_boards(env, board_envs):
+    '''
+    Check that every board can be reset on its own.
+    '''
+    if len(board_envs) < 2 or env.options.emulate:
+        return
+
+    if env.options.device == 'artik053':
+        console.fail('The ARTIK053 boards are reset by \'make download reset\', which can not '
+                     'select the board. Please use one board.')
+
+    if env.options.device == 'stm32f4dis':
+        if not all(board_env.options.stlink_serial for board_env in board_envs):
+            console.fail('Every STM32F4-Discovery board requires its ST-LINK serial to be reset '
+                         '(--stlink-serial or "stlink-serial" in the farm file).')
+
+
+def create_devices(env):
+    '''
+    Create a device object for every board.
+    '''
+    board_envs = board_environments(env)
+
+    check_boards(env, board_envs)
+
+    return [create_device(board_env) for board_env in board_envs]
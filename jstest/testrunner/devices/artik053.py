@@ -36,42 +36,18 @@ class ARTIK053Device(SerialDevice):
             return
 
         utils.execute(self.tizenrt.paths.os, 'make', ['download', 'reset'], quiet=True)
-        # Wait a moment to boot the device.
-        time.sleep(2)
 
-    def execute(self, testset, test):
+    def test_started(self):
         '''
-        Execute the given test.
+        Start the client script on a different thread for coverage.
         '''
-        self.reset()
-        self.login()
-
-        command = self._prepare_command(testset, test)
-        # Run the test on the device.
-        self.channel.putc(command[self.app])
-        self.channel.readline()
-
-        if self.env.options.coverage:
-            # Start the client script on a different thread for coverage.
-            client_thread = Thread(target=testrunner_utils.run_coverage_script,
-                                   kwargs={'env': self.env})
-            client_thread.daemon = True
-            client_thread.start()
-
-        message, output = self.channel.read_until('arm_dataabort', 'TASH>>')
-
-        if message == 'arm_dataabort':
-            output += self.channel.readline().replace('\r\n', '')
-
-        stdout, memstat, exitcode = testrunner_utils.process_output(output)
-
-        self.logout()
+        if not self.env.options.coverage:
+            return
 
-        return {
-            'output': stdout.rstrip('\r\n').replace('\r\n', '<br>'),
-            'memstat': memstat,
-            'exitcode': exitcode
-        }
+        client_thread = Thread(target=testrunner_utils.run_coverage_script,
+                               kwargs={'env': self.env})
+        client_thread.daemon = True
+        client_thread.start()
 
     def login(self):
         '''
@@ -16,6 +16,15 @@ import time
 import serial
 
 from jstest.common.utils import TimeoutException
+from jstest.testrunner.devices.connections.transport import SerialTransport
+
+
+# Time to wait for the prompt before pressing enter again.
+PROMPT_POLL_INTERVAL = 1
+
+# Maximum time of a blocking read from the serial port (the transport
+# only reads the port when it has data).
+READ_POLL_INTERVAL = 0.1
 
 
 class SerialConnection(object):
@@ -30,11 +39,16 @@ class SerialConnection(object):
         # Defines the end of the stdout.
         self.prompt = device_info['prompt']
 
+        self.serial = None
+        self.transport = None
+
     def open(self):
         '''
         Open the serial port.
         '''
-        self.serial = serial.Serial(port=self.id, baudrate=self.baud, timeout=self.timeout)
+        # Note: the data is received by the event loop of the transports.
+        self.serial = serial.Serial(port=self.id, baudrate=self.baud, timeout=READ_POLL_INTERVAL)
+        self.transport = SerialTransport(self.serial)
 
         # Press enters to start the serial communication.
         self.exec_command('\n\n')
@@ -43,15 +57,51 @@ class SerialConnection(object):
         '''
         Close the serial port.
         '''
+        self.transport.close()
         self.serial.close()
 
+    def wait_for_prompt(self, timeout):
+        '''
+        Wait until the shell prompt appears (e.g. after a reset).
+        '''
+        deadline = time.time() + timeout
+        port = None
+
+        while time.time() < deadline:
+            try:
+                # The USB serial port disappears for a moment during the reset.
+                if port is None:
+                    port = serial.Serial(port=self.id, baudrate=self.baud,
+                                         timeout=PROMPT_POLL_INTERVAL)
+
+                # Press enter until the shell answers with the prompt.
+                port.write('\n')
+
+                if self.prompt in port.read_until(self.prompt):
+                    port.close()
+                    return True
+
+            except (serial.SerialException, OSError):
+                if port is not None:
+                    port.close()
+                    port = None
+
+                time.sleep(PROMPT_POLL_INTERVAL)
+
+        if port is not None:
+            port.close()
+
+        return False
+
     def getc(self, size):
         '''
         Receive data from the serial port.
         '''
-        time.sleep(2)
+        try:
+            return self.transport.read(size, self.timeout)
 
-        return self.serial.read(size) or None
+        except TimeoutException:
+            return None
 
     def putc(self, data):
         '''
@@ -60,13 +110,18 @@ class SerialConnection(object):
         if isinstance(data, unicode):
             data = data.encode('utf8')
 
-        return self.serial.write(data + '\n')
+        return self.transport.write(data + '\n')
 
     def readline(self):
         '''
         Read line from the serial port.
         '''
-        return self.serial.readline()
+        try:
+            return self.read_until('\n')[1]
+
+        except TimeoutException:
+            # Return the partial line like serial.readline does.
+            return self.transport.take()
 
     def exec_command(self, cmd):
         '''
@@ -75,13 +130,10 @@ class SerialConnection(object):
         if isinstance(cmd, unicode):
             cmd = cmd.encode('utf8')
 
-        self.serial.write(cmd + '\n')
-
-        receive = self.serial.read_until(self.prompt)
+        self.transport.write(cmd + '\n')
 
         # Throw exception when timeout happens.
-        if self.prompt not in receive:
-            raise TimeoutException
+        _, receive = self.read_until(self.prompt)
 
         # Note: since the received data format is
         #
@@ -92,17 +144,7 @@ class SerialConnection(object):
 
     def read_until(self, *args):
         '''
-        Read data until it contains args.
+        Read data until it contains one of the args. Return the
+        found marker and the data until the end of the marker.
         '''
-        line = bytearray()
-        while True:
-            c = self.serial.read(1)
-            if c:
-                line += c
-                for stdout in args:
-                    if line[-len(stdout):] == stdout:
-                        return stdout, bytes(line)
-            else:
-                raise TimeoutException
-
-        return False, False
+        return self.transport.read_until(args, self.timeout)
@@ -16,6 +16,11 @@ import socket
 import paramiko
 
 from jstest.common.utils import TimeoutException
+from jstest.testrunner.devices.connections.transport import ChannelTransport
+
+
+# Maximum number of bytes that are received at once.
+RECEIVE_SIZE = 4096
 
 
 class SSHConnection(object):
@@ -30,6 +35,16 @@ class SSHConnection(object):
         self.timeout = device_info['timeout']
         self.prompt = device_info['prompt']
 
+        # Run every command on its own exec channel instead of the shell.
+        self.exec_mode = device_info.get('exec-mode', False)
+
+        # Long-lived command that answers the requests (see request()).
+        self.agent = None
+        self.agent_transport = None
+
+        self.chan = None
+        self.transport = None
+
         # Note: add your SSH key to the known host file
         # to avoid getting password.
         self.ssh = paramiko.client.SSHClient()
@@ -44,19 +59,41 @@ class SSHConnection(object):
         self.ssh.connect(hostname=self.ip, port=self.port, username=self.username,
                          password=self.password, look_for_keys=not bool(self.password))
 
+        if self.exec_mode:
+            return
+
         self.chan = self.ssh.invoke_shell()
+        self.transport = ChannelTransport(self.chan)
+
         self.read_until(self.prompt)
 
     def close(self):
         '''
         Close the ssh port.
         '''
+        self.close_agent()
+
+        if self.transport:
+            self.transport.close()
+
         self.ssh.close()
 
     def exec_command(self, cmd):
         '''
         Send command over the serial port.
         '''
+        if self.exec_mode:
+            stdout, stderr, exitcode = self.run(cmd)
+
+            if exitcode != 0:
+                raise RuntimeError('"%s" returned with exit status %d: %s'
+                                   % (cmd, exitcode, stderr.strip()))
+
+            # Like in the shell mode, the last line of the output is returned.
+            lines = stdout.rstrip('\r\n').split('\n')
+
+            return lines[-1].rstrip('\r')
+
         self.chan.settimeout(self.timeout)
         try:
             self.send(cmd)
@@ -66,6 +103,163 @@ class SSHConnection(object):
 
         return data
 
+    def run(self, cmd):
+        '''
+        Run the command on a new exec channel and return its stdout,
+        stderr and exit status.
+
+        Note: the channels share the transport of the connection,
+        so commands can be executed from multiple threads at once.
+        '''
+        chan = self.ssh.get_transport().open_session()
+        chan.settimeout(self.timeout)
+
+        stdout = bytearray()
+        stderr = bytearray()
+
+        try:
+            chan.exec_command(cmd)
+
+            while True:
+                data = chan.recv(RECEIVE_SIZE)
+
+                # Read the stderr as well to not block the command.
+                while chan.recv_stderr_ready():
+                    stderr += chan.recv_stderr(RECEIVE_SIZE)
+
+                if not data:
+                    break
+
+                stdout += data
+
+            while True:
+                data = chan.recv_stderr(RECEIVE_SIZE)
+
+                if not data:
+                    break
+
+                stderr += data
+
+            exitcode = chan.recv_exit_status()
+
+        except socket.timeout:
+            raise TimeoutException
+
+        finally:
+            chan.close()
+
+        return str(stdout), str(stderr), exitcode
+
+    def stream(self, cmd, stdin=None):
+        '''
+        Run the command on a new exec channel and yield its stdout line
+        by line as soon as the lines arrive.
+        '''
+        chan = self.ssh.get_transport().open_session()
+        chan.settimeout(self.timeout)
+
+        stdout = bytearray()
+        stderr = bytearray()
+        # Lines can't end before this position.
+        searched = 0
+
+        try:
+            chan.exec_command(cmd)
+
+            if stdin:
+                chan.sendall(stdin)
+            chan.shutdown_write()
+
+            while True:
+                data = chan.recv(RECEIVE_SIZE)
+
+                # Read the stderr as well to not block the command.
+                while chan.recv_stderr_ready():
+                    stderr += chan.recv_stderr(RECEIVE_SIZE)
+
+                if not data:
+                    break
+
+                stdout += data
+
+                while True:
+                    line_end = stdout.find('\n', searched)
+
+                    if line_end == -1:
+                        searched = len(stdout)
+                        break
+
+                    line = str(stdout[:line_end]).rstrip('\r')
+                    del stdout[:line_end + 1]
+                    searched = 0
+
+                    yield line
+
+            while True:
+                data = chan.recv_stderr(RECEIVE_SIZE)
+
+                if not data:
+                    break
+
+                stderr += data
+
+            exitcode = chan.recv_exit_status()
+
+        except socket.timeout:
+            raise TimeoutException
+
+        finally:
+            chan.close()
+
+        if exitcode != 0:
+            raise RuntimeError('"%s" returned with exit status %d: %s'
+                               % (cmd, exitcode, str(stderr).strip()))
+
+    def request(self, cmd, line):
+        '''
+        Send a line to the agent that is started by the command and return
+        its answer line. The agent is started at the first request.
+        '''
+        if not self.agent:
+            self.agent = self.ssh.get_transport().open_session()
+            self.agent.settimeout(self.timeout)
+            self.agent.exec_command(cmd)
+            self.agent_transport = ChannelTransport(self.agent)
+
+        try:
+            self.agent_transport.write(line + '\n')
+
+            _, answer = self.agent_transport.read_until(['\n'], self.timeout)
+
+        except EOFError:
+            stderr = bytearray()
+            while self.agent.recv_stderr_ready():
+                stderr += self.agent.recv_stderr(RECEIVE_SIZE)
+
+            self.close_agent()
+
+            raise EOFError('"%s" is stopped: %s' % (cmd, str(stderr).strip()))
+
+        except (TimeoutException, socket.timeout):
+            # The agent is still busy with the request, so a new one is
+            # started for the next request.
+            self.close_agent()
+
+            raise TimeoutException
+
+        return answer[:-1].rstrip('\r')
+
+    def close_agent(self):
+        '''
+        Stop the agent by closing its channel.
+        '''
+        if self.agent:
+            self.agent_transport.close()
+            self.agent.close()
+
+        self.agent = None
+        self.agent_transport = None
+
     def send(self, cmd):
         '''
         Send data over the ssh channel.
@@ -76,11 +270,10 @@ class SSHConnection(object):
         '''
         Receive data from the server until we get the expected pattern.
         '''
-        temp = ''
-        while expected not in temp:
-            temp += self.chan.recv(1)
+        _, data = self.transport.read_until([expected], self.timeout)
+
+        temp = data.split('\r\n')
 
-        temp = temp.split('\r\n')
         try:
             temp.pop()
             return temp[-1]
@@ -13,17 +13,16 @@
 # limitations under the License.
 
 import re
-import signal
+import socket
 import telnetlib
+import time
 
-from jstest.common.utils import TimeoutException
 from jstest.common import console
+from jstest.testrunner.devices.connections.transport import TelnetTransport
 
-def alarm_handler(_signum, _frame):
-    '''
-    Throw exception when alarm happens.
-    '''
-    raise TimeoutException
+
+# Time to wait for the prompt before pressing enter again.
+PROMPT_POLL_INTERVAL = 1
 
 
 class TelnetConnection(object):
@@ -35,24 +34,55 @@ class TelnetConnection(object):
         self.timeout = device_info['timeout']
         self.prompt = device_info['prompt']
 
+        # Note: the reads have their own deadlines (instead of SIGALRM),
+        # so the connections can be used from any thread.
         self.telnet = telnetlib.Telnet()
-
-        signal.signal(signal.SIGALRM, alarm_handler)
+        self.transport = None
 
     def open(self):
         '''
         Open the serial port.
         '''
         try:
-            self.telnet.open(self.ip)
-            self.telnet.read_until(self.prompt)
+            self.telnet.open(self.ip, timeout=self.timeout)
+            self.transport = TelnetTransport(self.telnet)
+
+            self.read_until(self.prompt)
         except Exception as e:
             console.fail(str(e))
 
+    def wait_for_prompt(self, timeout):
+        '''
+        Wait until the shell prompt appears (e.g. after a reset).
+        '''
+        deadline = time.time() + timeout
+
+        while time.time() < deadline:
+            telnet = telnetlib.Telnet()
+
+            try:
+                # The connection is refused until the network is up.
+                telnet.open(self.ip, timeout=PROMPT_POLL_INTERVAL)
+                telnet.write('\n')
+
+                if self.prompt in telnet.read_until(self.prompt, PROMPT_POLL_INTERVAL):
+                    return True
+
+            except (socket.error, EOFError):
+                time.sleep(PROMPT_POLL_INTERVAL)
+
+            finally:
+                telnet.close()
+
+        return False
+
     def close(self):
         '''
         Close the telnet communication.
         '''
+        if self.transport:
+            self.transport.close()
+
         self.telnet.close()
 
     def exec_command(self, cmd):
@@ -62,21 +92,39 @@ class TelnetConnection(object):
         if isinstance(cmd, unicode):
             cmd = cmd.encode('utf8')
         try:
-            self.telnet.write('%s\n' % cmd)
+            self.transport.write('%s\n' % cmd)
         except Exception as e:
             console.fail(str(e))
 
         return self._read_data()
 
-    def _read_data(self):
+    def putc(self, data):
         '''
-        Waiting for the prompt and removing that characters from the output.
+        Send data without waiting for the prompt.
         '''
-        signal.alarm(self.timeout)
+        if isinstance(data, unicode):
+            data = data.encode('utf8')
 
-        stdout = self.telnet.read_until(self.prompt)
+        self.transport.write(data + '\n')
 
-        signal.alarm(0)
+    def readline(self):
+        '''
+        Read a line from the telnet connection.
+        '''
+        return self.read_until('\n')[1]
+
+    def read_until(self, *args):
+        '''
+        Read data until it contains one of the args. Return the
+        found marker and the data until the end of the marker.
+        '''
+        return self.transport.read_until(args, self.timeout)
+
+    def _read_data(self):
+        '''
+        Waiting for the prompt and removing that characters from the output.
+        '''
+        _, stdout = self.read_until(self.prompt)
 
         stdout = re.sub('\n\r' + self.prompt, '', stdout)
         stdout = re.sub(self.prompt, '', stdout)
@@ -0,0 +1,406 @@
+# Copyright 2018-present Samsung Electronics Co., Ltd. and other contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import select
+import threading
+import time
+
+from jstest.common.utils import TimeoutException
+
+
+# Maximum number of bytes that are received at once.
+RECEIVE_SIZE = 4096
+
+# Maximum number of the received bytes that are kept in the buffer of a
+# transport. The oldest data is dropped when the device is too verbose.
+MAX_BUFFER_SIZE = 1024 * 1024
+
+
+class EventLoop(object):
+    '''
+    Receive the data of all the open transports with one select() loop.
+    The loop runs on a background thread and it also fires the deadlines
+    of the pending reads, so any number of boards can be driven by it.
+    '''
+    # The loop that is shared by all the transports (see shared()).
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    @classmethod
+    def shared(cls):
+        '''
+        Return the event loop that is shared by all the transports.
+        '''
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+
+            return cls._shared
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.transports = set()
+        self.thread = None
+
+        # Writing into the pipe interrupts the select() call when the
+        # transports or the deadlines are changed.
+        self.wakeup_reader, self.wakeup_writer = os.pipe()
+
+    def add(self, transport):
+        '''
+        Start receiving the data of the transport.
+        '''
+        with self.lock:
+            self.transports.add(transport)
+
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run)
+                self.thread.daemon = True
+                self.thread.start()
+
+        self.wakeup()
+
+    def remove(self, transport):
+        '''
+        Stop receiving the data of the transport.
+        '''
+        with self.lock:
+            self.transports.discard(transport)
+
+        self.wakeup()
+
+    def wakeup(self):
+        '''
+        Interrupt the waiting of the loop.
+        '''
+        os.write(self.wakeup_writer, b'x')
+
+    def _run(self):
+        '''
+        Wait for the incoming data and the deadlines of the transports.
+        '''
+        while True:
+            with self.lock:
+                transports = list(self.transports)
+
+            deadlines = [transport.deadline() for transport in transports]
+            deadlines = [deadline for deadline in deadlines if deadline is not None]
+
+            timeout = None
+            if deadlines:
+                timeout = max(0, min(deadlines) - time.time())
+
+            try:
+                readable, _, _ = select.select([self.wakeup_reader] + transports, [], [], timeout)
+
+            except (select.error, ValueError):
+                # The descriptor of a transport is closed or broken.
+                self._drop_broken(transports)
+                continue
+
+            for ready in readable:
+                if ready == self.wakeup_reader:
+                    os.read(self.wakeup_reader, RECEIVE_SIZE)
+                    continue
+
+                ready.receive()
+
+            for transport in transports:
+                transport.check_deadline()
+
+    @staticmethod
+    def _drop_broken(transports):
+        '''
+        Stop receiving the data of the transports that can't be selected.
+        '''
+        for transport in transports:
+            try:
+                select.select([transport], [], [], 0)
+
+            except (select.error, ValueError) as error:
+                transport.fail(IOError('The connection is broken: %s' % error))
+
+
+class Transport(object):
+    '''
+    Base class of the transports. The subclasses define how the data
+    is received and sent by the underlying stream.
+    '''
+    def __init__(self, stream, loop=None):
+        self.stream = stream
+        self.loop = loop or EventLoop.shared()
+
+        self.lock = threading.Lock()
+        # Received data that is not processed yet.
+        self.buffer = bytearray()
+        # The read that waits for data (see expect()).
+        self.pending = None
+        # The error that stopped the receiving (e.g. EOFError).
+        self.error = None
+        self.closed = False
+
+        self.loop.add(self)
+
+    def fileno(self):
+        '''
+        Return the file descriptor of the stream (for select()).
+        '''
+        return self.stream.fileno()
+
+    def close(self):
+        '''
+        Stop receiving the data of the stream.
+        '''
+        self.closed = True
+        self.loop.remove(self)
+
+    def write(self, data):
+        '''
+        Send data to the stream.
+        '''
+        self.stream.write(data)
+
+    def recv(self):
+        '''
+        Return the available data of the stream (empty string at the end
+        and None if the received bytes are not data).
+        '''
+        return os.read(self.fileno(), RECEIVE_SIZE)
+
+    def expect(self, markers, timeout, callback):
+        '''
+        Call the callback with the found marker and the data until the end
+        of the marker as soon as the data contains one of the markers. The
+        callback gets (None, None) at timeout and (None, error) if the
+        stream is broken. If the markers are None, any data is accepted.
+        '''
+        if markers is not None:
+            markers = [marker.encode('utf8') if isinstance(marker, unicode) else marker
+                       for marker in markers]
+
+        with self.lock:
+            self.pending = {
+                'markers': markers,
+                'deadline': time.time() + timeout,
+                'callback': callback,
+                # Markers can't end before this position.
+                'searched': 0
+            }
+
+            self._match()
+
+        # The loop should wait for the new deadline as well.
+        self.loop.wakeup()
+
+    def read_until(self, markers, timeout):
+        '''
+        Read data until it contains one of the markers. Return the
+        found marker and the data until the end of the marker.
+        '''
+        finished = threading.Event()
+        result = []
+
+        def callback(marker, data):
+            '''
+            Save the result of the read.
+            '''
+            result.append((marker, data))
+            finished.set()
+
+        self.expect(markers, timeout, callback)
+
+        # Note: waiting with timeout keeps the thread responsive
+        # to keyboard interrupts.
+        while not finished.wait(1):
+            pass
+
+        marker, data = result[0]
+
+        if marker is None:
+            if isinstance(data, Exception):
+                raise data
+
+            raise TimeoutException
+
+        return marker, data
+
+    def read(self, size, timeout):
+        '''
+        Read at most size bytes (at least one byte).
+        '''
+        _, data = self.read_until(None, timeout)
+
+        with self.lock:
+            # Return the rest of the data to the buffer.
+            self.buffer[:0] = data[size:]
+
+        return data[:size]
+
+    def take(self):
+        '''
+        Remove and return all the received data.
+        '''
+        with self.lock:
+            data = bytes(self.buffer)
+            self.buffer = bytearray()
+
+        return data
+
+    def deadline(self):
+        '''
+        Return the deadline of the pending read (or None).
+        '''
+        pending = self.pending
+
+        return pending['deadline'] if pending else None
+
+    def receive(self):
+        '''
+        Append the available data to the buffer (called by the loop).
+        '''
+        if self.closed:
+            return
+
+        try:
+            data = self.recv()
+
+            # Nothing to process (e.g. protocol data).
+            if data is None:
+                return
+
+            if not data:
+                raise EOFError('The connection is closed.')
+
+        except Exception as error:
+            self.fail(error)
+            return
+
+        with self.lock:
+            self.buffer += data
+
+            if len(self.buffer) > MAX_BUFFER_SIZE:
+                self._drop(len(self.buffer) - MAX_BUFFER_SIZE)
+
+            self._match()
+
+    def fail(self, error):
+        '''
+        Stop receiving the data and finish the pending read with the error.
+        '''
+        self.error = error
+        self.loop.remove(self)
+
+        with self.lock:
+            self._match()
+
+    def check_deadline(self):
+        '''
+        Finish the pending read if its deadline is passed (called by the loop).
+        '''
+        with self.lock:
+            if self.pending and time.time() >= self.pending['deadline']:
+                self._finish(None, None)
+
+    def _match(self):
+        '''
+        Finish the pending read if the buffer contains one of its markers.
+        '''
+        if not self.pending:
+            return
+
+        markers = self.pending['markers']
+        # The found marker and the end of the data that belongs to the read.
+        found, end = None, None
+
+        if markers is None:
+            if self.buffer:
+                # Note: the marker of the 'any data' reads is the empty string.
+                found, end = '', len(self.buffer)
+
+        else:
+            searched = self.pending['searched']
+
+            for marker in markers:
+                start = max(0, searched - len(marker) + 1)
+                position = self.buffer.find(marker, start)
+
+                # The earliest marker wins.
+                if position != -1 and (end is None or position + len(marker) < end):
+                    found, end = marker, position + len(marker)
+
+            self.pending['searched'] = len(self.buffer)
+
+        if end is not None:
+            data = bytes(self.buffer[:end])
+            del self.buffer[:end]
+
+            self._finish(found, data)
+
+        elif self.error:
+            self._finish(None, self.error)
+
+    def _drop(self, size):
+        '''
+        Remove the oldest size bytes of the buffer.
+        '''
+        del self.buffer[:size]
+
+        if self.pending and self.pending['markers'] is not None:
+            self.pending['searched'] = max(0, self.pending['searched'] - size)
+
+    def _finish(self, marker, data):
+        '''
+        Call the callback of the pending read.
+        '''
+        callback = self.pending['callback']
+        self.pending = None
+
+        callback(marker, data)
+
+
+class SerialTransport(Transport):
+    '''
+    Transport of a pyserial port.
+    '''
+    def recv(self):
+        # Note: the port is readable, so the read doesn't wait.
+        return self.stream.read(max(1, self.stream.in_waiting))
+
+
+class TelnetTransport(Transport):
+    '''
+    Transport of a telnetlib connection (the telnet commands of the
+    received data are processed by telnetlib).
+    '''
+    def recv(self):
+        data = self.stream.read_very_eager()
+
+        # Note: the received data could contain only telnet commands,
+        # which is not the end of the connection.
+        if not data and not self.stream.eof:
+            return None
+
+        return data
+
+
+class ChannelTransport(Transport):
+    '''
+    Transport of a paramiko channel.
+    '''
+    def write(self, data):
+        self.stream.sendall(data)
+
+    def recv(self):
+        return self.stream.recv(RECEIVE_SIZE)
@@ -18,6 +18,10 @@ import time
 from jstest.common import console, utils
 from jstest.testrunner import utils as testrunner_utils
 
+# Maximum time to wait for the shell prompt after a reset.
+BOOT_TIMEOUT = 30
+
+
 class RemoteDevice(object):
     '''
     Base class of all the device classes.
@@ -30,6 +34,9 @@ class RemoteDevice(object):
         self.channel = None
         self.os = os
 
+        # Output patterns that mean the device is crashed.
+        self.crash_markers = testrunner_utils.read_crash_signatures(env, os)
+
         self.check_args()
 
     def check_args(self):
@@ -52,12 +59,44 @@ class RemoteDevice(object):
         except Exception as e:
             console.fail(str(e))
 
+    def wait_for_boot(self):
+        '''
+        Wait until the device is ready to execute commands. Only the
+        connections that can wait for the shell prompt (serial, telnet)
+        are waited for, the others are ready when they are opened.
+        '''
+        if self.env.options.emulate or not hasattr(self.channel, 'wait_for_prompt'):
+            return True
+
+        return self.channel.wait_for_prompt(BOOT_TIMEOUT)
+
     def logout(self):
         '''
         Logout from the device.
         '''
         self.channel.close()
 
+    def execute(self, testset, test):
+        '''
+        Execute the test on the device and return its result.
+        '''
+        raise NotImplementedError('%s does not implement execute' % self.__class__.__name__)
+
+    def execute_batch(self, tests):
+        '''
+        Execute the given tests one by one and yield their results and
+        durations (the result is None in case of timeout).
+        '''
+        for testset, test in tests:
+            start_time = time.time()
+
+            try:
+                result = self.execute(testset, test)
+            except utils.TimeoutException:
+                result = None
+
+            yield result, time.time() - start_time
+
     def iotjs_build_info(self):
         '''
         Get buildinfo from iotjs.
@@ -69,15 +108,18 @@ class RemoteDevice(object):
             tester_py = 'python %s/tester.py ' % self.workdir
             iotjs = '%s/iotjs' % self.workdir
             buildinfo = '%s/tests/tools/iotjs_build_info.js' % self.workdir
-            template = '%s --cwd %s --cmd %s --testfile %s --iotjs-build-info'
+            # Note: the memory statistics are not needed, so the build info
+            # doesn't depend on the memstat library (or Freya).
+            template = '%s --cwd %s --cmd %s --testfile %s --iotjs-build-info --no-memstat'
             command = template % (tester_py, self.workdir, iotjs, buildinfo)
 
         elif self.device in ['artik053', 'stm32f4dis']:
             buildinfo = '/test/tools/iotjs_build_info.js'
             command = 'iotjs %s' % buildinfo
 
-        # Wait a moment to boot the device.
-        time.sleep(2)
+        # The device is restarted by the flashing.
+        if not self.wait_for_boot():
+            console.fail('The device did not boot in %d sec after the flashing.' % BOOT_TIMEOUT)
 
         self.login()
 
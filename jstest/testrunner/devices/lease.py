@@ -0,0 +1,455 @@
+# Copyright 2018-present Samsung Electronics Co., Ltd. and other contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import contextlib
+import errno
+import fcntl
+import glob
+import json
+import os
+import re
+import socket
+import tempfile
+import time
+
+from jstest.common import console, reporter, utils
+
+
+# Time between the attempts to acquire the boards (in seconds).
+POLL_INTERVAL = 1
+
+# Time window of the utilization report (in seconds).
+UTILIZATION_WINDOW = 24 * 60 * 60
+
+
+def board_key(board):
+    '''
+    Create a file name from the name or the address of the board.
+    '''
+    # Note: the only board of the device type could be used without
+    # address (e.g. default serial port), it's named after the device.
+    name = board.get('name') or board.get('ip') or board.get('device-id') or board['device']
+
+    # e.g. /dev/ttyACM0 -> _dev_ttyACM0
+    return re.sub(r'[^\w.-]', '_', name)
+
+
+def read_farm(options):
+    '''
+    Return the boards of the farm file that can run the app on the device.
+    '''
+    boards = []
+
+    for board in utils.read_json_file(options.farm)['boards']:
+        if board['device'] != options.device:
+            continue
+
+        # Boards without app list can run every app.
+        if options.app not in board.get('apps', [options.app]):
+            continue
+
+        # The IP address of the telnet boards is built into the NuttX image
+        # before the boards are leased, so these can't be selected by the farm.
+        if options.device == 'stm32f4dis' and board.get('ip'):
+            console.fail('Board %s of the farm uses telnet, but the STM32F4-Discovery boards '
+                         'of the farm can only be used over serial (device-id).' % board_key(board))
+
+        boards.append(board)
+
+    return boards
+
+
+def requested_boards(options):
+    '''
+    Return the candidate boards and the number of the required boards.
+    '''
+    if options.farm:
+        boards = read_farm(options)
+
+        if len(boards) < options.boards:
+            console.fail('The farm has %d board(s) for %s on %s, %d requested.'
+                         % (len(boards), options.app, options.device, options.boards))
+
+        return boards, options.boards
+
+    # The boards of the command line are leased all together.
+    if options.ip:
+        boards = [{'device': options.device, 'ip': ip} for ip in options.ips]
+    else:
+        boards = [{'device': options.device, 'device-id': dev} for dev in options.device_ids]
+
+    return boards, len(boards)
+
+
+@contextlib.contextmanager
+def lease_boards(env):
+    '''
+    Hold the leases of the boards of the job while the block runs. The
+    boards of the farm are assigned to the options of the job.
+    '''
+    options = env.options
+
+    # The emulated boards are private to the process.
+    if options.emulate:
+        yield
+        return
+
+    boards, count = requested_boards(options)
+
+    manager = LeaseManager(options.lease_dir)
+    leases = manager.acquire(boards, count, options.priority, owner=options.id)
+
+    try:
+        if options.farm:
+            options.ips = [lease['board'].get('ip') for lease in leases]
+            options.device_ids = [lease['board'].get('device-id') for lease in leases]
+            options.stlink_serials = [lease['board'].get('stlink-serial') for lease in leases]
+            options.ip = options.ips[0]
+            options.device_id = options.device_ids[0]
+            options.stlink_serial = options.stlink_serials[0]
+
+        yield
+
+    finally:
+        manager.release(leases)
+
+
+def report_status(options):
+    '''
+    Print the leases, the waiting jobs and the utilization of the boards.
+    '''
+    manager = LeaseManager(options.lease_dir)
+
+    if options.farm:
+        keys = [board_key(board) for board in utils.read_json_file(options.farm)['boards']]
+    else:
+        keys = manager.known_boards()
+
+    reporter.report_farm(manager.status(keys), manager.queue(), UTILIZATION_WINDOW)
+
+
+class LeaseManager(object):
+    '''
+    Exclusive access to the boards by lock files, so the jstest processes
+    of the machine can share the boards. The waiting processes are served
+    in priority order, then in arrival order.
+
+    The lock directory contains:
+      <board>.lock  locked (flock) by the holder of the board's lease
+      queue/*.ticket  the waiting processes, locked while they wait
+      usage.log  one JSON line per finished lease
+    '''
+    def __init__(self, lease_dir):
+        self.lease_dir = lease_dir
+        self.queue_dir = utils.join(lease_dir, 'queue')
+        self.usage_log = utils.join(lease_dir, 'usage.log')
+
+        utils.mkdir(self.queue_dir)
+
+    def acquire(self, boards, count, priority=0, owner=None):
+        '''
+        Wait until count boards of the given boards are free and lock them.
+        '''
+        ticket = self._enqueue(boards, count, priority)
+        start_time = time.time()
+        leases = None
+        reported = False
+
+        try:
+            while True:
+                if self._is_first(ticket):
+                    leases = self._lock(boards, count)
+
+                    if leases:
+                        break
+
+                if not reported:
+                    console.info('Waiting for %d free board(s) of %s...'
+                                 % (count, ', '.join(board_key(board) for board in boards)))
+                    reported = True
+
+                time.sleep(POLL_INTERVAL)
+
+        finally:
+            self._dequeue(ticket)
+
+        waited = time.time() - start_time
+
+        for lease in leases:
+            lease.update(start=time.time(), waited=waited)
+
+            self._write_holder(lease, {
+                'pid': os.getpid(),
+                'host': socket.gethostname(),
+                'owner': owner,
+                'priority': priority,
+                'since': lease['start']
+            })
+
+        console.info('Leased board(s): %s (waited %.1f sec)'
+                     % (', '.join(lease['key'] for lease in leases), waited))
+
+        return leases
+
+    def release(self, leases):
+        '''
+        Unlock the boards and record the usage.
+        '''
+        end_time = time.time()
+
+        with open(self.usage_log, 'a') as usage_log:
+            for lease in leases:
+                usage_log.write(json.dumps({
+                    'board': lease['key'],
+                    'pid': os.getpid(),
+                    'start': lease['start'],
+                    'end': end_time,
+                    'waited': lease['waited']
+                }) + '\n')
+
+        for lease in leases:
+            self._write_holder(lease, None)
+            self._unlock(lease['file'])
+
+    def known_boards(self):
+        '''
+        Return the keys of the boards that were ever leased.
+        '''
+        lock_files = glob.glob(utils.join(self.lease_dir, '*.lock'))
+
+        return sorted(utils.basename(lock_file)[:-len('.lock')] for lock_file in lock_files)
+
+    def status(self, keys):
+        '''
+        Return the holder and the utilization of the boards.
+        '''
+        now = time.time()
+        since = now - UTILIZATION_WINDOW
+        busy = dict.fromkeys(keys, 0.0)
+
+        for record in self._usage_records():
+            if record['board'] in busy:
+                # Only the part of the lease that is inside the window is counted.
+                duration = min(record['end'], now) - max(record['start'], since)
+                busy[record['board']] += max(0, duration)
+
+        boards = []
+        for key in keys:
+            holder = self._read_holder(key)
+
+            # The running lease is the part of the utilization as well.
+            if holder:
+                busy[key] += now - max(holder['since'], since)
+
+            boards.append({
+                'name': key,
+                'holder': holder,
+                'utilization': busy[key] / UTILIZATION_WINDOW
+            })
+
+        return boards
+
+    def queue(self):
+        '''
+        Return the waiting processes in the order they are served.
+        '''
+        tickets = []
+
+        for path in glob.glob(utils.join(self.queue_dir, '*.ticket')):
+            info = self._read_ticket(path)
+
+            if info:
+                tickets.append(info)
+
+        return sorted(tickets, key=lambda info: (-info['priority'], info['created']))
+
+    def _enqueue(self, boards, count, priority):
+        '''
+        Create the ticket of the process in the queue.
+        '''
+        info = {
+            'pid': os.getpid(),
+            'host': socket.gethostname(),
+            'priority': priority,
+            'created': time.time(),
+            'boards': [board_key(board) for board in boards],
+            'count': count
+        }
+
+        # The ticket is locked before it appears in the queue,
+        # so the others never see it as abandoned.
+        handle, temp_path = tempfile.mkstemp(dir=self.queue_dir, suffix='.tmp')
+        ticket_file = os.fdopen(handle, 'w')
+
+        json.dump(info, ticket_file)
+        ticket_file.flush()
+        fcntl.flock(ticket_file, fcntl.LOCK_EX)
+
+        path = temp_path[:-len('.tmp')] + '.ticket'
+        os.rename(temp_path, path)
+
+        return {
+            'path': path,
+            'file': ticket_file,
+            'info': info
+        }
+
+    def _dequeue(self, ticket):
+        '''
+        Remove the ticket of the process from the queue.
+        '''
+        utils.remove_file(ticket['path'])
+        self._unlock(ticket['file'])
+
+    def _is_first(self, ticket):
+        '''
+        Check that no waiting process is ahead of the ticket for its boards.
+        '''
+        info = ticket['info']
+        boards = set(info['boards'])
+        order = (-info['priority'], info['created'], ticket['path'])
+
+        for path in glob.glob(utils.join(self.queue_dir, '*.ticket')):
+            if path == ticket['path']:
+                continue
+
+            other = self._read_ticket(path)
+
+            # Only the processes that wait for the same boards are ahead.
+            if not other or not boards & set(other['boards']):
+                continue
+
+            if (-other['priority'], other['created'], path) < order:
+                return False
+
+        return True
+
+    def _read_ticket(self, path):
+        '''
+        Return the content of the ticket or None if the ticket is abandoned.
+        '''
+        try:
+            with open(path) as ticket_file:
+                if self._try_lock(ticket_file):
+                    # The waiting process is stopped.
+                    utils.remove_file(path)
+                    return None
+
+                return json.load(ticket_file)
+
+        except (IOError, ValueError):
+            # The ticket is removed in the meantime.
+            return None
+
+    def _lock(self, boards, count):
+        '''
+        Lock count free boards or none of them.
+        '''
+        leases = []
+
+        for board in boards:
+            key = board_key(board)
+            lock_file = open(utils.join(self.lease_dir, '%s.lock' % key), 'a+')
+
+            if not self._try_lock(lock_file):
+                lock_file.close()
+                continue
+
+            leases.append({
+                'key': key,
+                'board': board,
+                'file': lock_file
+            })
+
+            if len(leases) == count:
+                return leases
+
+        for lease in leases:
+            self._unlock(lease['file'])
+
+        return None
+
+    def _read_holder(self, key):
+        '''
+        Return the holder of the board or None if the board is free.
+        '''
+        path = utils.join(self.lease_dir, '%s.lock' % key)
+
+        if not utils.exists(path):
+            return None
+
+        with open(path) as lock_file:
+            if self._try_lock(lock_file):
+                return None
+
+            try:
+                return json.load(lock_file)
+            except ValueError:
+                # The holder is not written yet.
+                return {'since': time.time()}
+
+    def _usage_records(self):
+        '''
+        Return the finished leases.
+        '''
+        if not utils.exists(self.usage_log):
+            return []
+
+        records = []
+
+        with open(self.usage_log) as usage_log:
+            for line in usage_log:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    # Partially written line.
+                    continue
+
+        return records
+
+    @staticmethod
+    def _write_holder(lease, holder):
+        '''
+        Write the holder information into the lock file.
+        '''
+        lock_file = lease['file']
+        lock_file.seek(0)
+        lock_file.truncate()
+
+        if holder:
+            json.dump(holder, lock_file)
+
+        lock_file.flush()
+
+    @staticmethod
+    def _try_lock(lock_file):
+        '''
+        Lock the file without waiting. Return False if it's locked by others.
+        '''
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except IOError as e:
+            if e.errno in (errno.EAGAIN, errno.EACCES):
+                return False
+            raise
+
+        return True
+
+    @staticmethod
+    def _unlock(lock_file):
+        '''
+        Unlock and close the file.
+        '''
+        fcntl.flock(lock_file, fcntl.LOCK_UN)
+        lock_file.close()
@@ -12,12 +12,26 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from jstest.common import console
+import contextlib
+import time
+import uuid
+
+from jstest.common import console, utils
 from jstest.testrunner import utils as testrunner_utils
-from jstest.testrunner.devices.device_base import RemoteDevice
+from jstest.testrunner.devices.device_base import BOOT_TIMEOUT, RemoteDevice
 from jstest.testrunner.devices.connections.serialcom import SerialConnection
 from jstest.testrunner.devices.connections.telnetcom import TelnetConnection
 
+# Number of resets before giving up on a device that does not boot.
+BOOT_RETRIES = 3
+
+# The crash dump ends when the device is silent for this time (in seconds).
+CRASH_CONTEXT_TIMEOUT = 1
+
+# Maximum number of the crash dump lines that are added to the output.
+CRASH_CONTEXT_LINES = 30
+
+
 class SerialDevice(RemoteDevice):
     '''
     Common super class for serial devices.
@@ -40,6 +54,13 @@ class SerialDevice(RemoteDevice):
             data['baud'] = env.options.baud
             self.channel = SerialConnection(data)
 
+        # The session is kept open between the tests and the device is
+        # reset only when it is required by the reset policy.
+        self.reset_interval = env.options.reset_interval
+        self.tests_since_reset = 0
+        self.needs_reset = True
+        self.logged_in = False
+
     def check_args(self):
         '''
         Check that all the arguments are established.
@@ -53,6 +74,20 @@ class SerialDevice(RemoteDevice):
         '''
         pass
 
+    def restart(self):
+        '''
+        Reset the device and wait until its shell is available.
+        '''
+        for _ in range(BOOT_RETRIES):
+            self.reset()
+
+            if self.wait_for_boot():
+                return
+
+            console.warning('The device did not boot in %d sec, reset again.' % BOOT_TIMEOUT)
+
+        console.fail('The device did not boot after %d resets.' % BOOT_RETRIES)
+
     def login(self):
         '''
         Login to the device.
@@ -64,6 +99,276 @@ class SerialDevice(RemoteDevice):
         except Exception as e:
             console.fail(str(e))
 
+        self.logged_in = True
+
+    def logout(self):
+        '''
+        Logout from the device.
+        '''
+        if self.logged_in:
+            self.channel.close()
+
+        self.logged_in = False
+
+    def prepare(self):
+        '''
+        Reset the device if it is required and return the overhead in seconds.
+        '''
+        start_time = time.time()
+
+        if self.reset_interval and self.tests_since_reset >= self.reset_interval:
+            self.needs_reset = True
+
+        if self.needs_reset:
+            self.logout()
+            self.restart()
+
+            self.tests_since_reset = 0
+            self.needs_reset = False
+
+        if not self.logged_in:
+            self.login()
+
+        return time.time() - start_time
+
+    def execute(self, testset, test):
+        '''
+        Execute the given test.
+        '''
+        overhead = self.prepare()
+
+        try:
+            result = self.run_test(testset, test)
+
+        except utils.TimeoutException:
+            # The device is in an unknown state after a timeout.
+            self.needs_reset = True
+            raise
+
+        finally:
+            self.tests_since_reset += 1
+
+        if result['crashed']:
+            self.needs_reset = True
+
+        result['overhead'] = round(overhead, 3)
+
+        return result
+
+    def run_test(self, testset, test):
+        '''
+        Run the given test on the device.
+        '''
+        token = self._create_token()
+
+        self._send_framed_test(token, 0, testset, test)
+        self._read_framed_begin(token, 0)
+
+        self.test_started()
+
+        result = self._read_framed_result(token, 0, test)
+
+        # A crashed device doesn't print the prompt.
+        if not result['crashed']:
+            self.channel.read_until(self.channel.prompt)
+
+        return result
+
+    def test_started(self):
+        '''
+        Called when the test is started on the device.
+        '''
+        pass
+
+    def execute_batch(self, tests):
+        '''
+        Execute the given tests and yield their results and durations. In
+        batch mode the commands of the next test are sent to the shell while
+        the current test is running, so there is no waiting for the prompt.
+        '''
+        if not self.env.options.batch or self.env.options.coverage:
+            for result, duration in RemoteDevice.execute_batch(self, tests):
+                yield result, duration
+
+            return
+
+        tests = list(tests)
+        index = 0
+
+        while index < len(tests):
+            overhead = self.prepare()
+
+            # The batch is interrupted by the resets of the reset policy.
+            count = len(tests) - index
+            if self.reset_interval:
+                count = min(count, self.reset_interval - self.tests_since_reset)
+
+            # Note: the batch ends earlier if a test is timed out or crashed.
+            for result, duration in self._run_batch(tests[index:index + count]):
+                if result is not None:
+                    result['overhead'] = round(overhead, 3)
+                    overhead = 0
+
+                index += 1
+                self.tests_since_reset += 1
+
+                yield result, duration
+
+    def _run_batch(self, tests):
+        '''
+        Run the tests in one shell session.
+        '''
+        token = self._create_token()
+
+        self._send_framed_test(token, 0, *tests[0])
+
+        for index, (_, test) in enumerate(tests):
+            start_time = time.time()
+
+            try:
+                self._read_framed_begin(token, index)
+
+                # The next test waits in the input buffer of the shell.
+                if index + 1 < len(tests):
+                    self._send_framed_test(token, index + 1, *tests[index + 1])
+
+                result = self._read_framed_result(token, index, test)
+
+            except utils.TimeoutException:
+                # The device is in an unknown state after a timeout.
+                self.needs_reset = True
+
+                yield None, time.time() - start_time
+                return
+
+            duration = time.time() - start_time
+
+            if result['crashed']:
+                self.needs_reset = True
+
+                yield result, duration
+                return
+
+            yield result, duration
+
+        # Read the prompt after the last test.
+        self.channel.read_until(self.channel.prompt)
+
+    @staticmethod
+    def _create_token():
+        '''
+        Create a unique token for the begin and end lines of the tests.
+        '''
+        # Note: the token separates the output of the current command from
+        # the remaining output of an earlier (e.g. interrupted) command.
+        return uuid.uuid4().hex[:8]
+
+    @staticmethod
+    def _sentinel(token, index, kind):
+        '''
+        Create the begin or end line of a test.
+        '''
+        return 'JSTEST-%s-%d-%s' % (token, index, kind)
+
+    def _send_framed_test(self, token, index, testset, test):
+        '''
+        Send the command of the test framed by a begin and an end line.
+        The end line contains the exit code of the command.
+        '''
+        command = self._prepare_command(testset, test)[self.app]
+
+        self.channel.putc('\n'.join([
+            'echo %s' % self._sentinel(token, index, 'BEGIN'),
+            command,
+            'echo %s $?' % self._sentinel(token, index, 'END')
+        ]))
+
+    def _read_framed_begin(self, token, index):
+        '''
+        Skip the received data until the begin line of the test.
+        '''
+        # Note: the echo of the command is not matched because
+        # the begin line is at the start of a line.
+        self.channel.read_until('\n%s' % self._sentinel(token, index, 'BEGIN'))
+        self.channel.readline()
+
+    def _read_framed_result(self, token, index, test):
+        '''
+        Read the output of the test until its end line or a crash marker.
+        '''
+        end_marker = '\n%s ' % self._sentinel(token, index, 'END')
+
+        # Note: the shells can't stop a running test, so the time limit of
+        # the test is applied to the reading and the device is reset after it.
+        # A crashed device doesn't print anything after the crash dump, so
+        # the test is finished without waiting for the timeout.
+        with self._channel_timeout(test.get('timeout', self.channel.timeout)):
+            marker, output = self.channel.read_until(end_marker, *self.crash_markers)
+        crashed = marker != end_marker
+
+        if crashed:
+            output += self._read_crash_context()
+            status = None
+        else:
+            # The rest of the end line is the exit code.
+            status = self.channel.readline().strip()
+            # Remove the prompt of the end line (the output of the test
+            # could also contain the prompt).
+            output = output[:output.rfind(self.channel.prompt)]
+
+        output = output.replace('\r\n', '\n')
+        # Remove the echo of the test command.
+        output = output.split('\n', 1)[1] if '\n' in output else ''
+
+        stdout, memstat, exitcode = testrunner_utils.process_output(output)
+
+        # Note: shells without $? support (e.g. TASH) echo it back, so the
+        # exit code printed by the application is used.
+        if status and status.isdigit():
+            exitcode = int(status)
+
+        return {
+            'output': stdout.rstrip('\n').replace('\n', '<br>'),
+            'memstat': memstat,
+            'exitcode': exitcode,
+            'crashed': crashed
+        }
+
+    def _read_crash_context(self):
+        '''
+        Read the crash dump (e.g. registers, stack) that follows the crash marker.
+        '''
+        lines = []
+
+        try:
+            with self._channel_timeout(CRASH_CONTEXT_TIMEOUT):
+                while len(lines) < CRASH_CONTEXT_LINES:
+                    line = self.channel.readline()
+
+                    if not line:
+                        break
+
+                    lines.append(line)
+
+        except utils.TimeoutException:
+            pass
+
+        return ''.join(lines)
+
+    @contextlib.contextmanager
+    def _channel_timeout(self, timeout):
+        '''
+        Change the timeout of the channel temporarily.
+        '''
+        original = self.channel.timeout
+        self.channel.timeout = timeout
+
+        try:
+            yield
+
+        finally:
+            self.channel.timeout = original
+
     def _prepare_command(self, testset, test):
         '''
         Prepare the command which will be executed.
@@ -13,14 +13,28 @@
 # limitations under the License.
 
 import json
+import time
 from threading import Thread
 
-from jstest.common import console
+from jstest.common import console, utils
 from jstest.testrunner.devices.device_base import RemoteDevice
 from jstest.testrunner.devices.connections.sshcom import SSHConnection
 from jstest.testrunner import utils as testrunner_utils
 
 
+# Modules and features of the tests that use fixed network ports, the MQTT
+# broker, the peripherals of the board or shared files (the fs tests can
+# also write outside of the working directory), so they can't run concurrently.
+EXCLUSIVE_RESOURCES = set([
+    'adc', 'ble', 'dgram', 'fs', 'gpio', 'http', 'https', 'i2c', 'mqtt', 'net',
+    'pwm', 'spi', 'tcp', 'tls', 'uart', 'websocket'
+])
+
+# The tests are stopped by tester.py on the device, the timeout of the
+# connection is only a safety net (e.g. when the device hangs).
+TIMEOUT_MARGIN = 10
+
+
 class SSHDevice(RemoteDevice):
     '''
     Common super class for ssh devices.
@@ -36,8 +50,9 @@ class SSHDevice(RemoteDevice):
             'password': env.options.password,
             'ip': self.ip,
             'port': self.port,
-            'timeout': env.options.timeout,
-            'prompt': prompt
+            'timeout': env.options.timeout + TIMEOUT_MARGIN,
+            'prompt': prompt,
+            'exec-mode': env.options.ssh_exec
         }
 
         self.channel = SSHConnection(data)
@@ -72,11 +87,161 @@ class SSHDevice(RemoteDevice):
         FIXME: Remove the external tester.py to eliminate code duplications.
                Instead, this function should send commands to the device.
         '''
-        template = 'python %s/tester.py --cwd %s --cmd %s --testfile %s'
+        testfile = self._testfile(testset, test)
+
+        if self.env.options.coverage:
+            # Start the client script on a different thread for coverage.
+            client_thread = Thread(target=testrunner_utils.run_coverage_script,
+                                   kwargs={'env' :self.env})
+            client_thread.daemon = True
+            client_thread.start()
+
+        if self.env.options.agent:
+            # The agent is started once and it keeps running between the tests.
+            command = '%s --agent' % self._tester_command()
+            request = {
+                'testfile': testfile,
+                'timeout': test.get('timeout')
+            }
+            stdout = self.channel.request(command, json.dumps(request))
+
+        else:
+            command = '%s --testfile %s' % (self._tester_command(), testfile)
+            if test.get('timeout'):
+                command += ' --timeout %s' % test['timeout']
+
+            stdout = self.channel.exec_command(command)
+
+        # Since the stdout is a JSON text, parse it.
+        result = json.loads(stdout)
+
+        # The application is killed by tester.py, the device is usable.
+        if result.get('timeout'):
+            raise utils.TimeoutException
+        # The agent also sends these, but tester.py doesn't.
+        result.pop('testfile', None)
+        result.pop('duration', None)
+
+        return self._process_result(result)
+
+    def execute_batch(self, tests):
+        '''
+        Run the given tests with one tester.py invocation and yield their
+        results and durations as soon as they arrive.
+        '''
+        # Note: the coverage client has to be started for every test.
+        if not self.env.options.batch or self.env.options.coverage:
+            for result in RemoteDevice.execute_batch(self, tests):
+                yield result
+
+            return
+
+        pending = list(tests)
+
+        while pending:
+            manifest = []
+            for index, (testset, test) in enumerate(pending):
+                manifest.append({
+                    'id': index,
+                    'testfile': self._testfile(testset, test),
+                    'exclusive': self._is_exclusive(test),
+                    'timeout': test.get('timeout')
+                })
+
+            command = '%s --jobs %d --manifest -' % (self._tester_command(),
+                                                     self.env.options.device_jobs)
+            # The finished tests (results and durations) by their manifest id.
+            finished = {}
+            # The start time of the running tests by their manifest id.
+            running = {}
+            tester_pid = None
+            # Number of the results that are yielded from this manifest.
+            yielded = 0
+
+            try:
+                for line in self.channel.stream(command, json.dumps(manifest)):
+                    message = json.loads(line)
+
+                    if 'pid' in message:
+                        tester_pid = message['pid']
+
+                    elif 'started' in message:
+                        running[message['started']] = time.time()
+
+                    else:
+                        test_id = message.pop('id')
+                        if test_id not in running:
+                            raise ValueError('Unexpected result from tester.py: %s' % line)
+
+                        del running[test_id]
+                        message.pop('testfile')
+                        duration = message.pop('duration')
+
+                        if message.get('timeout'):
+                            finished[test_id] = (None, duration)
+                        else:
+                            finished[test_id] = (self._process_result(message), duration)
+
+                    # The concurrent tests can finish in any order, but the
+                    # results are yielded in the order of the tests.
+                    while yielded in finished:
+                        yield finished.pop(yielded)
+                        yielded += 1
+
+            except utils.TimeoutException:
+                # The device doesn't respond, so the tests that were running
+                # are hung. They are stopped with their tester.py and the tests
+                # that were not started are continued with a new tester.py.
+                self._kill_tester(tester_pid)
+
+                for test_id, start_time in running.items():
+                    finished[test_id] = (None, time.time() - start_time)
+
+                while yielded in finished:
+                    yield finished.pop(yielded)
+                    yielded += 1
+
+            if not yielded:
+                raise ValueError('tester.py did not return any result.')
+
+            pending = pending[yielded:]
+
+    def _kill_tester(self, tester_pid):
+        '''
+        Stop a hung tester.py and its running tests on the device.
+        '''
+        if not tester_pid:
+            return
+
+        # Note: every test runs in its own process group (see tester.py).
+        command = ('for child in $(pgrep -P %d); do kill -9 -$child; done; kill -9 %d'
+                   % (tester_pid, tester_pid))
+
+        try:
+            self.channel.run(command)
+
+        except Exception as e:
+            console.warning('tester.py (pid %d) could not be stopped: %s' % (tester_pid, e))
+
+    def _process_result(self, result):
+        '''
+        Detect the crashes and make the output of the tester.py result HTML friendly.
+        '''
+        # Note: the exit code is negative if the application is killed by a signal.
+        signature = testrunner_utils.find_crash_signature(result['output'], self.crash_markers)
+        result['crashed'] = bool(signature) or int(result['exitcode']) < 0
+
+        result['output'] = result['output'].rstrip('\n').replace('\n', '<br>')
+
+        return result
+
+    def _tester_command(self):
+        '''
+        Create the tester.py command without the testfile.
+        '''
+        template = 'python %s/tester.py --cwd %s --cmd %s'
         # Absolute path to the test folder.
         testdir = '%s/tests' % self.workdir
-        # Absolute path to the test file.
-        testfile = '%s/%s/%s' % (testdir, testset, test['name'])
         # Absolute path to the application.
         # Create the command that the device will execute.
         if self.device == 'rpi2':
@@ -84,29 +249,35 @@ class SSHDevice(RemoteDevice):
                 'iotjs': '%s/iotjs' % self.workdir,
                 'jerryscript': '%s/jerry' % self.workdir
             }
-            command = template % (self.workdir, testdir, apps[self.app], testfile)
+            command = template % (self.workdir, testdir, apps[self.app])
         else:
             iotjs = '%s/iotjs' % self.workdir
-            command = template % (self.workdir, testdir, iotjs, testfile)
+            command = template % (self.workdir, testdir, iotjs)
 
         if self.env.options.no_memstat:
             command += ' --no-memstat'
 
+        elif self.env.options.freya:
+            command += ' --freya'
+
         if self.env.options.debugger and self.env.options.debugger != 'no_address':
             port = testrunner_utils.read_port_from_url(self.env.options.debugger)
             command += ' --debug-port %s' % port
 
-        if self.env.options.coverage:
-            # Start the client script on a different thread for coverage.
-            client_thread = Thread(target=testrunner_utils.run_coverage_script,
-                                   kwargs={'env' :self.env})
-            client_thread.daemon = True
-            client_thread.start()
+        return command
 
-        stdout = self.channel.exec_command(command)
-        # Since the stdout is a JSON text, parse it.
-        result = json.loads(stdout)
-        # Make HTML friendly stdout.
-        result['output'] = result['output'].rstrip('\n').replace('\n', '<br>')
+    @staticmethod
+    def _is_exclusive(test):
+        '''
+        Check whether the test uses resources that can't be shared by concurrent tests.
+        '''
+        required = set(test.get('required-modules', []))
+        required.update(test.get('required-features', []))
 
-        return result
+        return bool(required & EXCLUSIVE_RESOURCES)
+
+    def _testfile(self, testset, test):
+        '''
+        Return the absolute path of the test file on the device.
+        '''
+        return '%s/tests/%s/%s' % (self.workdir, testset, test['name'])
@@ -12,10 +12,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import time
-
 from jstest.common import utils
-from jstest.testrunner import utils as testrunner_utils
 from jstest.testrunner.devices.serial_device import SerialDevice
 
 class STM32F4Device(SerialDevice):
@@ -34,29 +31,9 @@ class STM32F4Device(SerialDevice):
         if self.env.options.emulate:
             return
 
-        utils.execute(self.stlink.src, 'build/Release/st-flash', ['reset'], quiet=True)
-        # Wait a moment to boot the device.
-        time.sleep(5)
-
-    def execute(self, testset, test):
-        '''
-        Execute the given test.
-        '''
-        self.reset()
-        self.login()
-
-        command = self._prepare_command(testset, test)
-        # Run the test on the device.
-        output = self.channel.exec_command(command[self.app])
-
-        stdout, memstat, _ = testrunner_utils.process_output(output)
-        # Process the exitcode of the last command.
-        exitcode = self.channel.exec_command('echo $?')
-
-        self.logout()
+        args = ['reset']
+        # Select the programmer of the board if more boards are connected.
+        if self.env.options.stlink_serial:
+            args = ['--serial', self.env.options.stlink_serial] + args
 
-        return {
-            'output': stdout.rstrip('\n').replace('\n', '<br>'),
-            'memstat': memstat,
-            'exitcode': exitcode
-        }
+        utils.execute(self.stlink.src, 'build/Release/st-flash', args, quiet=True)
@@ -0,0 +1,121 @@
+# Copyright 2018-present Samsung Electronics Co., Ltd. and other contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import glob
+import math
+import os
+
+from jstest.common import paths, utils
+
+
+# Number of the earlier results that are used to estimate the durations.
+HISTORY_SIZE = 5
+
+# The time limit of a test is a percentile of its known durations multiplied
+# by the safety factor, but not less than the floor (in seconds). The global
+# --timeout is the cap.
+TIMEOUT_PERCENTILE = 90
+TIMEOUT_FACTOR = 3
+TIMEOUT_FLOOR = 10
+
+
+class TestHistory(object):
+    '''
+    Estimate the duration of the tests from the earlier results.
+    '''
+    def __init__(self, env):
+        self.testpath = env.modules.app.paths.tests
+        self.max_timeout = env.options.timeout
+        self.durations = {}
+
+        result_dir = utils.join(paths.RESULT_PATH, env.options.app, env.options.device)
+        # Note: the coverage results (cov-*.json) don't contain test durations.
+        result_files = sorted(glob.glob(utils.join(result_dir, '[!c]*.json')),
+                              key=os.path.getmtime)
+
+        for result_file in result_files[-HISTORY_SIZE:]:
+            try:
+                tests = utils.read_json_file(result_file).get('tests', [])
+            except ValueError:
+                continue
+
+            for test in tests:
+                if 'duration' in test:
+                    self.durations.setdefault(test['name'], []).append(test['duration'])
+
+        # The file size of the tests without history is converted to
+        # seconds by the average speed of the known tests.
+        self.rate = 1.0
+
+        test_files = {}
+        for root, _, files in os.walk(self.testpath):
+            for name in files:
+                test_files[name] = utils.join(root, name)
+
+        known_sizes = 0
+        known_durations = 0
+        for name, durations in self.durations.iteritems():
+            if name in test_files:
+                known_durations += self.average(durations)
+                known_sizes += os.path.getsize(test_files[name])
+
+        if known_sizes and known_durations:
+            self.rate = known_durations / known_sizes
+
+    def estimate(self, testset, test):
+        '''
+        Return the expected duration of the test in seconds.
+        '''
+        durations = self.durations.get(test['name'])
+
+        if durations:
+            return self.average(durations)
+
+        filename = utils.join(self.testpath, testset, test['name'])
+
+        if not utils.exists(filename):
+            return 0
+
+        return os.path.getsize(filename) * self.rate
+
+    def timeout(self, test):
+        '''
+        Return the time limit of the test in seconds (the history is keyed
+        by the test name, like the saved results).
+        '''
+        durations = self.durations.get(test['name'])
+
+        # Tests without history get the global timeout.
+        if not durations:
+            return self.max_timeout
+
+        limit = self.percentile(durations, TIMEOUT_PERCENTILE) * TIMEOUT_FACTOR
+
+        return int(math.ceil(min(self.max_timeout, max(TIMEOUT_FLOOR, limit))))
+
+    @staticmethod
+    def average(durations):
+        '''
+        Calculate the average of the durations.
+        '''
+        return float(sum(durations)) / len(durations)
+
+    @staticmethod
+    def percentile(durations, percent):
+        '''
+        Calculate the percentile of the durations (nearest-rank method).
+        '''
+        rank = int(math.ceil(len(durations) * percent / 100.0))
+
+        return sorted(durations)[max(0, rank - 1)]
@@ -0,0 +1,130 @@
+# Copyright 2018-present Samsung Electronics Co., Ltd. and other contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import collections
+import heapq
+import threading
+
+
+class WorkStealingQueue(object):
+    '''
+    Distribute the tests between the boards.
+    '''
+    def __init__(self, items, workers, cost=None):
+        self.lock = threading.Condition()
+        self.shards = [collections.deque() for _ in range(workers)]
+        self.loads = [0] * workers
+        self.stopped = set()
+        # Number of the items that are taken but not finished yet.
+        self.running = 0
+        self.cost = cost or (lambda item: 1)
+
+        # The initial shards are created by longest-processing-time-first
+        # scheduling: the longest remaining test is assigned to the least
+        # loaded shard, so every shard starts with its longest tests.
+        shards = [(0, index) for index in range(workers)]
+
+        for item in sorted(items, key=self.cost, reverse=True):
+            _, index = heapq.heappop(shards)
+
+            self.shards[index].append(item)
+            self.loads[index] += self.cost(item)
+
+            heapq.heappush(shards, (self.loads[index], index))
+
+    def get(self, worker, wait=True):
+        '''
+        Return the next item of the worker or None if all the items are done.
+        '''
+        with self.lock:
+            while True:
+                item = self._take(worker)
+
+                if item is not None:
+                    self.running += 1
+                    return item
+
+                # The running items could be returned by a failed worker.
+                if not (wait and self.running):
+                    return None
+
+                self.lock.wait()
+
+    def done(self):
+        '''
+        Mark a taken item as finished.
+        '''
+        with self.lock:
+            self.running -= 1
+            self.lock.notify_all()
+
+    def _take(self, worker):
+        '''
+        Remove the next item from the shard of the worker or steal one.
+        '''
+        shard = self.shards[worker]
+
+        if not shard:
+            # An idle worker steals from the end (the shortest tests)
+            # of the most loaded shard.
+            victims = [index for index in range(len(self.shards)) if self.shards[index]]
+
+            if not victims:
+                return None
+
+            victim = max(victims, key=lambda index: self.loads[index])
+
+            item = self.shards[victim].pop()
+            self.loads[victim] -= self.cost(item)
+
+            return item
+
+        item = shard.popleft()
+        self.loads[worker] -= self.cost(item)
+
+        return item
+
+    def stop(self, worker, items=()):
+        '''
+        Move the unfinished items of a failed worker to the other workers.
+        '''
+        with self.lock:
+            self.stopped.add(worker)
+
+            shard = self.shards[worker]
+            for item in reversed(items):
+                shard.appendleft(item)
+                self.loads[worker] += self.cost(item)
+
+            self.running -= len(items)
+
+            active = [index for index in range(len(self.shards)) if index not in self.stopped]
+
+            # Keep the items if there is no worker to execute them.
+            while shard and active:
+                item = shard.pop()
+                self.loads[worker] -= self.cost(item)
+
+                target = min(active, key=lambda index: self.loads[index])
+                self.shards[target].appendleft(item)
+                self.loads[target] += self.cost(item)
+
+            self.lock.notify_all()
+
+    def remaining(self):
+        '''
+        Return the items that were not executed by any worker.
+        '''
+        with self.lock:
+            return [item for shard in self.shards for item in shard]
@@ -53,6 +53,17 @@ class Skiplist(object):
 
         return False
 
+    def timeout(self, testset, test):
+        '''
+        Return the time limit of the test that the local test descriptor
+        defines (or None).
+        '''
+        for obj in self.test_descriptor.get('timeouts', []):
+            if obj['name'] in [testset, test['name']]:
+                return obj['timeout']
+
+        return None
+
     def _skip_iotjs_test(self, test):
         '''
         Determine if an iotjs test has to be skipped.
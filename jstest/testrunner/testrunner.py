@@ -12,12 +12,21 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from jstest.common import paths, reporter, utils
+import threading
+import time
+
+from jstest.common import console, paths, reporter, utils
 from jstest.testrunner import utils as testrunner_utils
 from jstest.testrunner import devices
+from jstest.testrunner.history import TestHistory
+from jstest.testrunner.scheduler import WorkStealingQueue
 from jstest.testrunner.skiplist.skiplist import Skiplist
 
 
+# Number of tests that a board takes at once in batch mode.
+BATCH_SIZE = 8
+
+
 def read_testsets(env):
     '''
     Read all the tests into dictionary.
@@ -41,10 +50,17 @@ class TestRunner(object):
         if environment.options.no_test:
             return
 
-        self.device = devices.create_device(environment)
+        # The tests are shared between the boards of the same type. The
+        # first board is used to read the build information of the app.
+        self.devices = devices.create_devices(environment)
+        self.device = self.devices[0]
         self.results = []
         self.coverage_info = {}
 
+        # The earlier results are used to schedule the tests and
+        # to limit their running time on the device.
+        self.history = TestHistory(environment)
+
         # Flash the device to be able to run the tests.
         self.skiplist = Skiplist(environment, self.device)
 
@@ -59,8 +75,16 @@ class TestRunner(object):
 
         reporter.report_configuration(self.env)
 
-        for testset, tests in read_testsets(self.env).items():
-            self.run_testset(testset, tests)
+        testsets = read_testsets(self.env)
+        start_time = time.time()
+
+        if len(self.devices) > 1:
+            self.run_sharded(testsets)
+
+        else:
+            self.run_sequential(testsets)
+
+        elapsed_time = time.time() - start_time
 
         if self.env.options.coverage:
             device = self.env.options.device
@@ -77,57 +101,220 @@ class TestRunner(object):
 
             reporter.report_coverage(self.coverage_info)
 
-        reporter.report_final(self.results)
+        reporter.report_final(self.results, elapsed_time)
 
-    def run_testset(self, testset, tests):
+    def run_sequential(self, testsets):
         '''
-        Run all the tests that are in the given testset.
+        Run all the tests on the only board.
         '''
-        reporter.report_testset(testset)
+        tests = [(testset, test) for testset, tests in testsets.items() for test in tests]
+        # Note: the results are reported as soon as the tests are finished.
+        testresults = self.run_tests(self.device, tests)
 
-        for test in tests:
-            testresult = {
-                'name': test['name']
-            }
+        for testset, tests in testsets.items():
+            reporter.report_testset(testset)
 
-            # 1. Skip tests.
-            if self.skiplist.contains(testset, test):
-                reporter.report_skip(test['name'], test.get('reason'))
+            for _ in tests:
+                testresult = next(testresults)
 
-                testresult['result'] = 'skip'
-                testresult['reason'] = test.get('reason')
+                self.report_test(testresult)
                 self.results.append(testresult)
 
+    def run_sharded(self, testsets):
+        '''
+        Run the tests on all the boards in parallel.
+        '''
+        items = []
+        for testset, tests in testsets.items():
+            for test in tests:
+                items.append((len(items), testset, test))
+
+        # The long tests are distributed first and started early on
+        # the boards, so the boards finish at about the same time.
+        queue = WorkStealingQueue(items, len(self.devices),
+                                  cost=lambda item: self.history.estimate(item[1], item[2]))
+        testresults = [None] * len(items)
+        errors = []
+
+        # Every board runs more tests at once in batch mode.
+        batch_size = BATCH_SIZE if self.env.options.batch else 1
+
+        def worker(index, device):
+            '''
+            Execute tests on the given board until the queue becomes empty.
+            '''
+            while True:
+                items = []
+                while len(items) < batch_size:
+                    # Only the first item is waited for, the worker
+                    # shouldn't wait for its own running items.
+                    item = queue.get(index, wait=not items)
+
+                    if item is None:
+                        break
+
+                    items.append(item)
+
+                if not items:
+                    return
+
+                finished = 0
+
+                try:
+                    for testresult in self.run_tests(device, [item[1:] for item in items]):
+                        testresults[items[finished][0]] = testresult
+                        finished += 1
+
+                        queue.done()
+
+                except Exception as e:
+                    # The other boards continue with the tests of the failed board.
+                    console.warning('Board #%d is stopped: %s' % (index, e))
+                    errors.append(e)
+                    queue.stop(index, items[finished:])
+                    return
+
+        threads = []
+        for index, device in enumerate(self.devices):
+            thread = threading.Thread(target=worker, args=(index, device))
+            thread.daemon = True
+            thread.start()
+            threads.append(thread)
+
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(1)
+
+        if queue.remaining():
+            raise errors[0]
+
+        # Report the results in the original order of the tests.
+        for testset, tests in testsets.items():
+            reporter.report_testset(testset)
+
+            for _ in tests:
+                testresult = testresults[len(self.results)]
+
+                self.report_test(testresult)
+                self.results.append(testresult)
+
+    def run_tests(self, device, tests):
+        '''
+        Run the given tests on the device and yield their results in order.
+        '''
+        skipped = [self.skiplist.contains(testset, test) for testset, test in tests]
+
+        executed = [item for item, skip in zip(tests, skipped) if not skip]
+
+        # The devices stop the tests that run longer than their time limit.
+        for testset, test in executed:
+            test['timeout'] = self.timeout(testset, test)
+
+        # The concurrent tests of the board are started in longest-first
+        # order as well, so the board doesn't wait for a late long test.
+        order = range(len(executed))
+        if self.env.options.batch and self.env.options.device_jobs > 1:
+            order = sorted(order, key=lambda index: self.history.estimate(*executed[index]),
+                           reverse=True)
+
+        results = device.execute_batch([executed[index] for index in order])
+        # The results that arrived before the results of the earlier tests.
+        received = {}
+        fetched = 0
+        position = 0
+
+        for (_, test), skip in zip(tests, skipped):
+            if skip:
+                yield {
+                    'name': test['name'],
+                    'result': 'skip',
+                    'reason': test.get('reason')
+                }
+
                 continue
 
-            # 2. Execute the test and handle timeout.
-            try:
-                result = self.device.execute(testset, test)
+            while position not in received:
+                # Note: the StopIteration would silently finish this generator.
+                try:
+                    received[order[fetched]] = next(results)
+                except StopIteration:
+                    missing = [executed[index][1]['name'] for index in order[fetched:]]
+                    raise ValueError('The device did not return the result of %s'
+                                     % ', '.join(missing))
 
-            except utils.TimeoutException:
-                reporter.report_timeout(test['name'])
+                fetched += 1
 
-                testresult['result'] = 'timeout'
-                self.results.append(testresult)
+            result, duration = received.pop(position)
+            position += 1
 
-                continue
+            yield self.create_testresult(test, result, duration)
 
-            # 3. Process the result of the test.
-            expected_failure = test.get('expected-failure', False)
-            exitcode = int(result['exitcode'])
+    def timeout(self, testset, test):
+        '''
+        Return the time limit of the test in seconds.
+        '''
+        timeout = self.skiplist.timeout(testset, test)
+
+        # Note: the global timeout is the limit of the overrides as well.
+        if timeout:
+            return min(timeout, self.env.options.timeout)
+
+        return self.history.timeout(test)
+
+    @staticmethod
+    def create_testresult(test, result, duration):
+        '''
+        Create the testresult from the result of the device (None means timeout).
+        '''
+        testresult = {
+            'name': test['name'],
+            # The durations are used to schedule the tests of the next runs.
+            'duration': round(duration, 3)
+        }
+
+        # The time limit is saved to see why a test is timed out.
+        if 'timeout' in test:
+            testresult['timeout'] = test['timeout']
+
+        if result is None:
+            testresult['result'] = 'timeout'
 
-            if bool(exitcode) == expected_failure:
-                reporter.report_pass(test['name'])
+            return testresult
 
-                testresult['result'] = 'pass'
-                testresult['memstat'] = result['memstat']
+        expected_failure = test.get('expected-failure', False)
+        exitcode = int(result['exitcode'])
 
-            else:
-                reporter.report_fail(test['name'])
-                testresult['result'] = 'fail'
+        # Note: a crash is not accepted as an expected failure.
+        if bool(exitcode) == expected_failure and not result.get('crashed'):
+            testresult['result'] = 'pass'
+            testresult['memstat'] = result['memstat']
 
-            testresult['output'] = result['output']
-            self.results.append(testresult)
+        else:
+            testresult['result'] = 'fail'
+
+        testresult['output'] = result['output']
+
+        # Time spent with resetting and logging into the device.
+        if 'overhead' in result:
+            testresult['overhead'] = result['overhead']
+
+        return testresult
+
+    @staticmethod
+    def report_test(testresult):
+        '''
+        Print the result of the test.
+        '''
+        name = testresult['name']
+
+        if testresult['result'] == 'skip':
+            reporter.report_skip(name, testresult['reason'])
+        elif testresult['result'] == 'timeout':
+            reporter.report_timeout(name)
+        elif testresult['result'] == 'pass':
+            reporter.report_pass(name)
+        else:
+            reporter.report_fail(name)
 
     def save(self):
         '''
@@ -154,6 +154,27 @@ def process_output(output):
     return output, memstat, exitcode
 
 
+def read_crash_signatures(env, os_name):
+    '''
+    Collect the output patterns that mean the device (or the application) is crashed.
+    '''
+    signatures = utils.read_json_file(paths.CRASH_SIGNATURES).get(os_name, [])
+
+    # Note: the serial connection searches in byte buffers.
+    return [signature.encode('utf8') for signature in signatures] + env.options.crash_signature
+
+
+def find_crash_signature(output, signatures):
+    '''
+    Return the first crash signature that the output contains.
+    '''
+    for signature in signatures:
+        if signature in output:
+            return signature
+
+    return None
+
+
 def run_coverage_script(env):
     '''
     Start the client script.
@@ -36,6 +36,8 @@ BASE_COMMAND = ['python', '-m', 'jstest']
 RELEASE_ARG = ['--buildtype', 'release']
 DEBUG_ARG = ['--buildtype', 'debug']
 COMMON_ARGS = ['--emulate', '--no-memstat', '--quiet']
+# Run the tests of the release build again with concurrent batches.
+BATCH_ARGS = ['--no-build', '--device-jobs', '2']
 
 DEVICES = ['rpi2', 'rpi3', 'artik053', 'stm32f4dis']
 
@@ -67,6 +69,10 @@ def build_app(option):
     exec_docker(release_command)
     exec_docker(debug_command)
 
+    # The batches are executed by tester.py on the SSH devices.
+    if option.device[0] in ['rpi2', 'rpi3']:
+        exec_docker(BASE_COMMAND + app_arg + RELEASE_ARG + device_arg + COMMON_ARGS + BATCH_ARGS)
+
 
 def run_docker():
     '''